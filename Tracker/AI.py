@@ -29,6 +29,7 @@
     the cutting into segments, the size calculation of each segment and the composition of all the hyphae.
     It also saves the id number of the image and the coordinates of the followed apex during 
     each step in order to make it easier to visualize it on the user interface.
+    The skeleton images can be kept in memory with 1 bit per pixel thanks to the class SkeletonFrame.
 
 .. moduleauthor:: Salomé Attar
 .. moduleauthor:: Bouthayna Haltout
@@ -37,16 +38,56 @@
 
 
 import math 
+import collections
+import concurrent.futures
+import multiprocessing
+
+import numpy as np
+
 import Mushroom as msh 
 
 
-def play_analysis(pictures, analysis):
+FRAME_CACHE_SIZE = 16 # number of skeleton frames kept converted in memory
+PREFETCH_FRAMES = 4 # number of images decoded in advance from the image reached by the analysis
+_frameCache = collections.OrderedDict() # id(Image) : (Image, ndarray, {derived data}), in least recently used order
+
+# Labels of the topology map of a skeleton, computed from the number of white neighbours of each white pixel
+BACKGROUND = 0 # black pixel
+ENDPOINT = 1 # 1 neighbour: end of a hypha (apex)
+PATH = 2 # 2 neighbours: inside a hypha
+JUNCTION = 3 # 3 neighbours: node
+CLUSTER = 4 # 4 neighbours or more: artefact
+ISOLATED = 5 # no neighbour
+
+BAND_ROWS = 1024 # number of rows of an image read by areas handled at once when the whole image is needed (see _bands)
+DRIFT_PIXELS = 8 # number of pixels of the end of the hypha moved when the next image drifts
+REGISTRATION_SIZE = 4096 # side of the area in the centre of the images correlated to compute their drift
+
+# Events sent while the analysis runs (see analysis_events): the kind of event, the index of the image and the related data
+Event = collections.namedtuple("Event", ["kind", "image", "data"])
+FRAME = "Frame" # a hypha reached a new image, data: Coordinates of its apex
+SEGMENT = "Segment" # a segment is closed, data: the HyphaSegment
+NODE = "Node" # a node is found, data: Coordinates of the node
+BACKTRACK = "Backtrack" # the analysis goes back to a node to follow its other hypha, data: Coordinates of the start of the hypha
+END = "End" # the analysis is over, data: (message, True if the analysis is done)
+
+_workerState = {} # frames, walker and offsets of a process exploring branches (see track_apex_parallel)
+
+
+def play_analysis(pictures, analysis, walker=None, offsets=None, workers=1):
     """ 
     Method enabling the analysis managing and extracting the list data of the received images.
+    Each apex of the analysis origins is followed in turn with :func:`track_apex`, the segments found from each of them forming a separate forest.
+    With several workers, the branches of each apex are explored by a pool of processes (see :func:`track_apex_parallel`).
 
     :param pictures: list of successive hyphae growth images
     :type pictures: list[Image, str]
     :param Analysis analysis: the attribute :class:`Analysis` of the project 
+    :param walker: the function following the hypha on an image, :func:`picture_analyze` (pixel by pixel) by default, or :func:`Graph.graph_analyze`
+    :type walker: function
+    :param offsets: the drift of each image compared to the previous one (see :func:`frame_offsets`), None if unknown
+    :type offsets: list[Coordinates]
+    :param int workers: the number of processes exploring the branches
     :return: True when the analysis is done, False otherwise and a string indicating the state of the analysis
     :rtype: (bool, str)
     
@@ -55,28 +96,253 @@ def play_analysis(pictures, analysis):
     .. codeauthor:: Bouthayna Haltout    
     """
 
+    for event in analysis_events(pictures, analysis, walker, offsets, workers):
+        pass
+    return event.data
+
+def analysis_events(pictures, analysis, walker=None, offsets=None, workers=1):
+    """
+    Generator running the analysis like :func:`play_analysis`, step by step: the progress of the analysis is sent as :data:`Event` tuples
+    (:data:`FRAME`, :data:`SEGMENT`, :data:`NODE` and :data:`BACKTRACK`), the last one being :data:`END`.
+    
+    :param pictures: list of successive hyphae growth images
+    :type pictures: list[Image, str]
+    :param Analysis analysis: the attribute :class:`Analysis` of the project 
+    :param walker: the function following the hypha on an image (see :func:`play_analysis`)
+    :type walker: function
+    :param offsets: the drift of each image compared to the previous one, None if unknown
+    :type offsets: list[Coordinates]
+    :param int workers: the number of processes exploring the branches
+    :return: the events of the analysis
+    :rtype: generator[Event]
+    
+    The analysis followed sequentially keeps where it stands in analysis.tracker (see :class:`TrackerState`), 
+    up to date at each :data:`FRAME` and :data:`BACKTRACK` event: an analysis saved at one of these events and interrupted 
+    is resumed from there by this function.
+    """
+
+    resumed = analysis.tracker # state of an interrupted analysis
+    if resumed != None and resumed.frontier != None: # interrupted extension
+        return (yield from extension_events(pictures, analysis, analysis.endImg, walker, offsets))
+    for iOrigin, apex in enumerate(analysis.origins):
+        if resumed != None and iOrigin < resumed.origin:
+            continue # already followed before the interruption
+        if resumed != None and iOrigin == resumed.origin:
+            known_segments = set(resumed.known)
+            tracking = track_apex(pictures, analysis, apex, walker, offsets, single=(len(analysis.origins) == 1), state=resumed)
+        else:
+            if iOrigin > 0 and apex in analysis.list_pixels: 
+                continue # this apex has already been reached while following another one
+            known_segments = set(analysis.segments)
+            if workers > 1:
+                tracking = track_apex_parallel(pictures, analysis, apex, walker, offsets, workers, single=(len(analysis.origins) == 1))
+            else:
+                analysis.tracker = msh.TrackerState(iOrigin, known_segments)
+                tracking = track_apex(pictures, analysis, apex, walker, offsets, single=(len(analysis.origins) == 1), state=analysis.tracker)
+        error = yield from _prefetching(pictures, tracking, analysis.startImg, analysis.endImg)
+        if error != None:
+            yield Event(END, None, (error, False))
+            return
+        analysis.forests[iOrigin] = [id for id in analysis.segments if id not in known_segments]
+        analysis.tracker = None
+
+    result_hyphae = list_hypha_creation(analysis.segments) 
+    if result_hyphae == "Error, segments dict is void":
+        yield Event(END, None, (result_hyphae, False))
+    else:
+        analysis.hyphae = result_hyphae
+        yield Event(END, analysis.endImg, ("Analysis ended.", True))
+
+def frontier_segments(analysis):
+    """
+    Method listing the segments of a finished analysis whose hypha reaches its end image: the ends of the hyphae to follow into later images.
+    
+    :param Analysis analysis: the analysis
+    :return: the segments, in the order of their ids
+    :rtype: list[HyphaSegment]
+    """
+    
+    return [segment for segment in analysis.segments.values() if segment.deadEnd and analysis.endImg+1 in segment.evolution]
+
+def extension_events(pictures, analysis, endImg, walker=None, offsets=None):
+    """
+    Generator extending a finished analysis to later images, up to the image 'endImg': only the hyphae of its frontier (see :func:`frontier_segments`) 
+    are followed, from their apex into the new images, knowing all the pixels already found. Their segments go on instead of ending at the previous end image,
+    and the segments found are added to the forest of their apex. The events are those of :func:`analysis_events`, 
+    and an interrupted extension is resumed from analysis.tracker like an analysis.
+    
+    :param pictures: list of successive hyphae growth images
+    :type pictures: list[Image, str]
+    :param Analysis analysis: the attribute :class:`Analysis` of the project, whose end image becomes 'endImg'
+    :param int endImg: the index of the new end image
+    :param walker: the function following the hypha on an image (see :func:`play_analysis`)
+    :type walker: function
+    :param offsets: the drift of each image compared to the previous one, None if unknown
+    :type offsets: list[Coordinates]
+    :return: the events of the extension
+    :rtype: generator[Event]
+    """
+    
+    state = analysis.tracker
+    if state == None:
+        frontier = frontier_segments(analysis)
+        if not frontier:
+            yield Event(END, None, ("No hypha reaches the end image of the analysis.", False))
+            return
+        state = msh.TrackerState(None, [])
+        state.frontier = [[segment.id, analysis.endImg+1] for segment in frontier]
+        analysis.endImg = endImg
+        analysis.tracker = state
+    
+    origins = {id: iOrigin for iOrigin, segments in analysis.forests.items() for id in segments}
+    while state.segment != None or state.frontier:
+        if state.segment == None:
+            _reopen_segment(analysis, state, origins)
+        tracking = explore_branch(pictures, analysis, state.segment, state.num_picture, state.coord, walker, offsets, state=state)
+        error = yield from _prefetching(pictures, tracking, state.num_picture, analysis.endImg)
+        if error != None:
+            yield Event(END, None, (error, False))
+            return
+        known_segments = set(state.known)
+        analysis.forests.setdefault(state.origin, []).extend(id for id in analysis.segments if id not in known_segments)
+        state.segment = None
+    analysis.tracker = None
+    
+    analysis.hyphae = list_hypha_creation(analysis.segments)
+    yield Event(END, analysis.endImg, ("Analysis ended.", True))
+
+def _reopen_segment(analysis, state, origins):
+    """
+    Prepares the state of the tracking to follow the next segment of the frontier of an extended analysis, as if its end image had not been reached.
+    """
+    
+    id, image = state.frontier.pop(0)
+    segment = analysis.segments[id]
+    apex = segment.evolution.pop(image)[0] # written when the end image was reached, like the last coordinates
+    segment.coord.pop()
+    # The end of the hypha is read at the end of the list of pixels (see shift_correction): the pixels found after its apex are moved before the others,
+    # so that the list ends as it did when the hypha reached the end image.
+    pixels = analysis.list_pixels
+    if apex in pixels:
+        last = len(pixels) - 1 - next(i for i, pixel in enumerate(reversed(pixels)) if pixel == apex)
+        found_after = list(pixels[last+1:])
+        del pixels[last+1:]
+        pixels[0:0] = found_after
+    state.origin = origins.get(id, 0)
+    state.known = sorted(analysis.segments)
+    state.segment, state.num_picture, state.coord, state.previous, state.check, state.nodes = segment, image, apex, apex, True, []
+
+def _prefetching(pictures, events, first, last):
+    """
+    Generator passing on the events of a tracking, and asking the list of images to decode in advance (see :meth:`InOut.ImageStore.prefetch`)
+    the :data:`PREFETCH_FRAMES` images following the image reached, or the image of the node the analysis goes back to.
+    The lists which can't decode their images in advance are read as they are.
+    """
+    
+    prefetch = getattr(pictures, 'prefetch', None)
+    if prefetch == None:
+        return (yield from events)
+    
+    prefetch(range(first, min(first+PREFETCH_FRAMES, last+1)))
+    while True:
+        try:
+            event = next(events)
+        except StopIteration as stop:
+            return stop.value
+        if event.kind in (FRAME, BACKTRACK):
+            prefetch(range(event.image, min(event.image+PREFETCH_FRAMES, last+1)))
+        yield event
+
+def track_apex(pictures, analysis, apex, walker=None, offsets=None, single=True, state=None):
+    """ 
+    Method following an apex of the start image of the analysis and all its hyphae daughters until the end image.
+    The segments, steps and pixels found are added to the :class:`Analysis`.
+
+    :param pictures: list of successive hyphae growth images
+    :type pictures: list[Image, str]
+    :param Analysis analysis: the attribute :class:`Analysis` of the project 
+    :param Coordinates apex: the :class:`Coordinates` of the apex to follow
+    :param walker: the function following the hypha on an image (see :func:`play_analysis`)
+    :type walker: function
+    :param offsets: the drift of each image compared to the previous one, None if unknown
+    :type offsets: list[Coordinates]
+    :param bool single: True if the apex is the only one followed by the analysis, False otherwise (an apex that can't be followed is then skipped)
+    :param TrackerState state: the state kept up to date during the tracking, the tracking being resumed from it if it has started
+    :return: the events of the analysis (see :func:`analysis_events`), then None when the apex has been followed, a string describing the error otherwise
+    :rtype: generator[Event]
+    
+    .. codeauthor:: Sébastien Maillos
+    .. codeauthor:: Salomé Attar
+    .. codeauthor:: Bouthayna Haltout    
+    """
+
+    if state != None and state.segment != None: # resumed
+        return (yield from explore_branch(pictures, analysis, state.segment, state.num_picture, state.coord, walker, offsets, state=state))
+    
+    nb_pixels = len(analysis.list_pixels)
+    init_list_pixels(analysis.list_pixels, pictures[analysis.startImg], apex)
+    if len(analysis.list_pixels) == nb_pixels:
+        return "No hypha could be followed from this apex." if single else None # skipped among several apexes
+    
+    segment = _branch_segment(analysis, 0, analysis.startImg, apex)
+    return (yield from explore_branch(pictures, analysis, segment, analysis.startImg, apex, walker, offsets, state=state))
+
+def explore_branch(pictures, analysis, segment, num_picture, coord, walker=None, offsets=None, siblings=None, state=None):
+    """ 
+    Method following a hypha from the given pixel until the end image, the segments, steps and pixels found being added to the :class:`Analysis`.
+    At each node, the analysis goes on with one of the 2 new hyphae. 
+    The other one is either explored afterwards (its node is kept in a stack), or handed over in the list 'siblings' if it is given.
+
+    :param pictures: list of successive hyphae growth images
+    :type pictures: list[Image, str]
+    :param Analysis analysis: the attribute :class:`Analysis` of the project 
+    :param HyphaSegment segment: the segment starting at the given pixel
+    :param int num_picture: the index of the image where the hypha starts
+    :param Coordinates coord: the :class:`Coordinates` of the pixel where the hypha starts
+    :param walker: the function following the hypha on an image (see :func:`play_analysis`)
+    :type walker: function
+    :param offsets: the drift of each image compared to the previous one, None if unknown
+    :type offsets: list[Coordinates]
+    :param siblings: the list receiving the hyphae to explore later: [image index, :class:`Coordinates` of the start pixel, id of the previous segment, number of pixels known when found]
+    :type siblings: list[list]
+    :param TrackerState state: the state kept up to date at each :data:`FRAME` and :data:`BACKTRACK` event and once the hypha has been followed, 
+                               the exploration being resumed from it if it has started
+    :return: the events of the analysis (see :func:`analysis_events`), then None when the hypha has been followed, a string describing the error otherwise
+    :rtype: generator[Event]
+    
+    .. codeauthor:: Sébastien Maillos
+    .. codeauthor:: Salomé Attar
+    .. codeauthor:: Bouthayna Haltout    
+    """
+
     # initialization of the variables :
+    if walker == None:
+        walker = picture_analyze
     analyze = True
-    segment = msh.HyphaSegment(0, analysis.startApex)
-    segment.evolution[analysis.startImg] = (analysis.startApex,1)
     nodes = [] # Will contain a list of each entry. List components : 1: image of where the node is, 2: coordinates of the node.
-    num_picture = analysis.startImg
-    coord_analyze = analysis.startApex
-    previous_coord_analyze = analysis.startApex
+    coord_analyze = coord
+    previous_coord_analyze = coord
     list_skelPics = pictures
     check_pixel_no_hypha = False
-    init_list_pixels(analysis.list_pixels, list_skelPics[num_picture], analysis.startApex)
+    if state != None and state.segment != None: # resumed where the state was saved
+        nodes, previous_coord_analyze, check_pixel_no_hypha = state.nodes, state.previous, state.check
     
-    num_step = 0
+    num_step = max(analysis.steps, default=0) # the steps of the apexes followed before are kept
     while analyze == True: # As long as the analysis is ongoing.
         num_step+=1
-        list_foreign_pixel = []
+        list_foreign_pixel = msh.PixelList()
         result = None
         # This part is launched only when the analysis changes the image to continue the following of the apex.
         # (Not for the return on an image through a node nor an artefact, because the analysis of the area and the referal of the pixels not belonging to the hypha has already been done.)
         if check_pixel_no_hypha == True:
+            offset = offsets[num_picture] if offsets else msh.Coordinates(0, 0)
             #Looks in the area of the new image and localize the pixels not belonging to the hypha and update list_foreign_pixel.
-            photography_zone_comparison(list_skelPics[num_picture-1], list_skelPics[num_picture], analysis.list_pixels,list_foreign_pixel, previous_coord_analyze)
+            photography_zone_comparison(list_skelPics[num_picture-1], list_skelPics[num_picture], analysis.list_pixels,list_foreign_pixel, previous_coord_analyze, offset)
+            if offset.x != 0 or offset.y != 0:
+                # The drift of the new image is known: the end of the hypha is moved accordingly, so that the local search of the shift is not needed.
+                coord_analyze = coord_analyze + offset
+                for i in range(1, min(DRIFT_PIXELS, len(analysis.list_pixels))+1):
+                    analysis.list_pixels[-i] = analysis.list_pixels[-i] + offset
             # If needed, rectify the analysis coordinates ( if they change on the new image ).
             result = check_apexCoord_newPic(list_skelPics[num_picture-1], list_skelPics[num_picture], analysis.list_pixels, coord_analyze)
             check_pixel_no_hypha = False
@@ -85,9 +351,9 @@ def play_analysis(pictures, analysis):
             else:
                 coord_analyze = result[1] 
         if result != "No analysis":
-            result = picture_analyze(list_skelPics[num_picture], analysis.list_pixels, list_foreign_pixel, coord_analyze) #A couple (string,coordinates).           
+            result = walker(list_skelPics[num_picture], analysis.list_pixels, list_foreign_pixel, coord_analyze) #A couple (string,coordinates).           
             if result[0] == "Error, pixel list is void":
-                return (result[0], False)
+                return result[0]
 
         if result[0] == "Apex" :
             segment.deadEnd = True
@@ -107,14 +373,20 @@ def play_analysis(pictures, analysis):
                 segment.deadEnd = True
                 segment.size=calculated_size(segment)
                 analysis.segments[segment.id] = segment
+                yield Event(SEGMENT, num_picture-1, segment)
                 if not nodes:
                     break
                 else: # If none of the above, but the analysis continue. 
-                    segment = msh.HyphaSegment(nodes[-1][2], nodes[-1][1])#We put nodes instead of result[2] because we go backwards and we want the coordinates of the last node.
+                    segment = analysis.new_segment(nodes[-1][2], nodes[-1][1])#We put nodes instead of result[2] because we go backwards and we want the coordinates of the last node.
                     segment.evolution[num_picture] = [(nodes[-1][1]),1]
                     num_picture=nodes[-1][0] # We go to the last node of the list, and we take the first on the list. 
                     coord_analyze=nodes[-1][1]
                     del nodes[-1] # We delete the last node from the list to update it.
+                    _keep_state(state, segment, num_picture, coord_analyze, previous_coord_analyze, check_pixel_no_hypha, nodes)
+                    yield Event(BACKTRACK, num_picture, coord_analyze)
+            else:
+                _keep_state(state, segment, num_picture, coord_analyze, previous_coord_analyze, check_pixel_no_hypha, nodes)
+                yield Event(FRAME, num_picture, coord_analyze)
               
         elif result[0] == "Node": # If the found pixel is a node.
             segment.coord.append(result[1]) # Segment update. 
@@ -122,18 +394,25 @@ def play_analysis(pictures, analysis):
             segment.deadEnd = False
             segment.size = calculated_size(segment)
             analysis.segments[segment.id] = segment
+            yield Event(SEGMENT, num_picture, segment)
+            yield Event(NODE, num_picture, result[1])
             if result[1] == "o" or result[1] == "n" or result[1] == "e" or result[1] == "N":
                 analysis.steps[num_step] = [None, None]
             else:
                 analysis.steps[num_step] = [result[1], num_picture]
             previous_id = segment.id
-            segment = msh.HyphaSegment(previous_id, result[2])
+            segment = analysis.new_segment(previous_id, result[2])
             segment.evolution[num_picture] = [result[2], 1]
-            nodes.append([num_picture, result[3], previous_id])
+            if siblings == None:
+                nodes.append([num_picture, result[3], previous_id])
+            else: # the other hypha is explored elsewhere, knowing the pixels found up to now
+                siblings.append([num_picture, result[3], previous_id, len(analysis.list_pixels)])
             coord_analyze = result[2]
         elif result[0] == "No analysis":
             analysis.steps[num_step] = [None, None]
             num_picture+=1
+            _keep_state(state, segment, num_picture, coord_analyze, previous_coord_analyze, check_pixel_no_hypha, nodes)
+            yield Event(FRAME, num_picture, coord_analyze)
         else: # If it's an artefact.
             segment.coord.append(result[1])
             segment.evolution[num_picture] = [result[1], result[4]]
@@ -144,23 +423,301 @@ def play_analysis(pictures, analysis):
                 analysis.steps[num_step]=[None, None]
             else:
                 analysis.steps[num_step] = [result[1], num_picture]
+            yield Event(SEGMENT, num_picture, segment)
             if not nodes:
                 break
             else:
-                segment = msh.HyphaSegment(nodes[-1][2], nodes[-1][1])
+                segment = analysis.new_segment(nodes[-1][2], nodes[-1][1])
                 segment.evolution[num_picture] = [(nodes[-1][1]), 1]
                 num_picture = nodes[-1][0] # We go to the last node on the list, and on this list we want the first node.
                 coord_analyze = nodes[-1][1]
                 del nodes[-1] # We delete the last node from the list to update it.
+                _keep_state(state, segment, num_picture, coord_analyze, previous_coord_analyze, check_pixel_no_hypha, nodes)
+                yield Event(BACKTRACK, num_picture, coord_analyze)
+    _keep_state(state, segment, num_picture, coord_analyze, previous_coord_analyze, check_pixel_no_hypha, nodes) # where the next hypha starts from (see track_apex_parallel)
+    return None
 
-    result_hyphae = list_hypha_creation(analysis.segments) 
-    if result_hyphae == "Error, segments dict is void":
-        return (result_hyphae, False)
+def _keep_state(state, segment, num_picture, coord, previous, check, nodes):
+    """
+    Updates the state of the tracking (if any) with the variables of :func:`explore_branch`.
+    """
+    
+    if state != None:
+        state.segment, state.num_picture, state.coord, state.previous, state.check, state.nodes = segment, num_picture, coord, previous, check, nodes
+        
+def track_apex_parallel(pictures, analysis, apex, walker=None, offsets=None, workers=2, single=True):
+    """
+    Method following an apex like :func:`track_apex`, the branches being explored by a pool of processes.
+    Each task follows one hypha with :func:`explore_branch` and sends back the other hyphae met at its nodes, 
+    which are put in the stack of branches to explore and handed over to the first idle process.
+    A branch knows the pixels found up to the end of the branch which found it, but not the ones found meanwhile in the other branches.
+    The results are merged in the order in which :func:`explore_branch` follows the branches, and a branch which would have been explored otherwise 
+    knowing the branches merged before it is explored again, so that the analysis is the same as with a single process.
+    
+    The images are packed once and given to the processes when they start (shared without copy where processes are forked).
+    The events sent are the furthest image reached by the branches as they end, and the segments once merged.
+    
+    :param pictures: list of successive hyphae growth images
+    :type pictures: list[Image, str]
+    :param Analysis analysis: the attribute :class:`Analysis` of the project 
+    :param Coordinates apex: the :class:`Coordinates` of the apex to follow
+    :param walker: the function following the hypha on an image (see :func:`play_analysis`)
+    :type walker: function
+    :param offsets: the drift of each image compared to the previous one, None if unknown
+    :type offsets: list[Coordinates]
+    :param int workers: the number of processes
+    :param bool single: True if the apex is the only one followed by the analysis, False otherwise (an apex that can't be followed is then skipped)
+    :return: the events of the analysis (see :func:`analysis_events`), then None when the apex has been followed, a string describing the error otherwise
+    :rtype: generator[Event]
+    """
+    
+    nb_pixels = len(analysis.list_pixels)
+    init_list_pixels(analysis.list_pixels, pictures[analysis.startImg], apex)
+    if len(analysis.list_pixels) == nb_pixels:
+        return "No hypha could be followed from this apex." if single else None # skipped among several apexes
+    
+    frames = [None] * len(pictures) # only the images of the analysis are needed
+    for i in range(analysis.startImg, min(analysis.endImg, len(pictures)-1)+1):
+        frames[i] = (pack_skeleton(pictures[i][0]), pictures[i][1])
+    if 'fork' in multiprocessing.get_all_start_methods():
+        context = multiprocessing.get_context('fork')
     else:
-        analysis.hyphae = result_hyphae
+        context = multiprocessing.get_context()
+    
+    # A branch is identified by the path leading to it in the tree: the root is (), the j-th sibling found by the branch k is k+(j,).
+    results = {} # branch : result of _explore_task
+    parents = {} # branch : id of the previous segment in the branch which found it
+    starts = {(): (analysis.startImg, apex, None)} # branch : (image index, Coordinates, end of the previous hypha or None) of its start (see _start_branch)
+    knowns = {} # branch : (x, y) of the pixels known by its process
+    known = _pixel_array(analysis.list_pixels)
+    furthest = analysis.startImg
+    with concurrent.futures.ProcessPoolExecutor(workers, mp_context=context, initializer=_init_worker, 
+                                                initargs=(frames, walker, offsets, analysis.startImg, analysis.endImg)) as pool:
+        pending = {pool.submit(_explore_task, (analysis.startImg, apex.x, apex.y, 0, known, None)) : ((), known)}
+        while pending:
+            done, _ = concurrent.futures.wait(pending, return_when=concurrent.futures.FIRST_COMPLETED)
+            for future in done:
+                branch, known = pending.pop(future)
+                results[branch] = future.result()
+                knowns[branch] = known
+                error, _, _, steps, pixels, depth, _, _, _, end, siblings = results[branch]
+                if error != None:
+                    for other in pending:
+                        other.cancel()
+                    return error
+                reached = max((step[1] for step in steps if step[1] != None), default=furthest)
+                if min(reached, analysis.endImg) > furthest:
+                    furthest = min(reached, analysis.endImg)
+                    yield Event(FRAME, furthest, None)
+                branch_known = np.concatenate((known[:len(known)-depth], pixels)) # the pixels known at the end of the branch
+                for j, (num_picture, coord, previous_id, _) in enumerate(siblings):
+                    # The last hypha found is followed right after the branch, from where the branch ends (see explore_branch).
+                    start = end if j == len(siblings)-1 else None
+                    parents[branch+(j,)] = previous_id
+                    starts[branch+(j,)] = (num_picture, coord, start)
+                    task = (num_picture, coord.x, coord.y, previous_id, branch_known, start)
+                    pending[pool.submit(_explore_task, task)] = (branch+(j,), branch_known)
+    
+    # The branches are merged in the order in which explore_branch follows them (the last node found first), and their segments are numbered again.
+    # A branch whose exploration depends on the pixels found by the branches merged before it or on the end of the last one is explored again, knowing them.
+    num_step = max(analysis.steps, default=0)
+    new_ids = {} # branch : {id of a segment in its process : id in the analysis}
+    explored_again = set()
+    end = None # (image index, check, Coordinates of the previous apex) where the last branch merged ends
+    for branch in sorted(results, key=lambda branch: tuple(-j for j in branch)):
+        if branch and branch[:-1] in explored_again: # already explored with the branch which found it
+            explored_again.add(branch)
+            continue
+        _, root_id, segments, steps, pixels, depth, absent, present, first, branch_end, _ = results[branch]
+        previous_id = new_ids[branch[:-1]][parents[branch]] if branch else 0
+        num_picture, coord, start = starts[branch]
+        same = start == end if start != None else _same_start(pictures, analysis, num_picture, coord, end, offsets, first)
+        if not same or not _same_reads(analysis.list_pixels, knowns[branch], depth, absent, present, pixels):
+            explored_again.add(branch)
+            segment, state = _start_branch(analysis, previous_id, num_picture, coord, end)
+            error = yield from explore_branch(pictures, analysis, segment, num_picture, coord, walker, offsets, state=state)
+            if error != None:
+                return error
+            num_step = max(analysis.steps, default=0)
+            end = (state.num_picture, state.check, state.previous)
+            continue
+        
+        new_ids[branch] = dict(zip(sorted(segment.id for segment in segments), analysis.segmentIds.reserve(len(segments))))
+        for segment in segments:
+            if segment.id == root_id and start == None and end != None: # started from scratch instead of after the previous hypha
+                segment.evolution = {end[0]: [coord, 1], **segment.evolution}
+            segment.previous = previous_id if segment.id == root_id else new_ids[branch][segment.previous]
+            segment.id = new_ids[branch][segment.id]
+            analysis.segments[segment.id] = segment
+            yield Event(SEGMENT, max(segment.evolution), segment)
+        for step in steps:
+            num_step += 1
+            analysis.steps[num_step] = step
+        del analysis.list_pixels[len(analysis.list_pixels)-depth:]
+        analysis.list_pixels.extend(msh.Coordinates(x, y) for x, y in pixels.tolist())
+        end = branch_end
+    return None
+
+def _branch_segment(analysis, previous_id, num_picture, coord):
+    """
+    Returns the segment starting a branch at the given pixel, the previous segment being 0 for the apex.
+    """
+    
+    segment = analysis.new_segment(previous_id, coord)
+    if previous_id == 0:
+        segment.evolution[num_picture] = (coord,1)
+    else:
+        segment.evolution[num_picture] = [coord, 1]
+    return segment
+
+def _start_branch(analysis, previous_id, num_picture, coord, end):
+    """
+    Returns the segment and the state (see :class:`TrackerState`) with which :func:`explore_branch` starts a branch at the given pixel: from scratch if 'end' is None, 
+    otherwise as explore_branch goes back to a node, after the hypha ending at 'end' (image index, check, :class:`Coordinates` of the previous apex).
+    """
+    
+    state = msh.TrackerState(None, [])
+    if end == None:
+        return (_branch_segment(analysis, previous_id, num_picture, coord), state)
+    segment = analysis.new_segment(previous_id, coord)
+    segment.evolution[end[0]] = [coord, 1]
+    _keep_state(state, segment, num_picture, coord, end[2], end[1], [])
+    return (segment, state)
+
+def _same_start(pictures, analysis, num_picture, coord, end, offsets, first):
+    """
+    Returns True if a branch started from scratch (see :func:`_start_branch`) is explored like after the hypha ending at 'end':
+    the search of the pixels not belonging to the hypha on a new image changes neither its start nor the pixels 'first' looked for on its first image.
+    """
+    
+    if end == None or not end[1]:
+        return True
+    offset = offsets[num_picture] if offsets else msh.Coordinates(0, 0)
+    if offset.x != 0 or offset.y != 0 or not is_white(pictures[num_picture], coord):
+        return False
+    if len(delete_pixel_same(check_point(pictures[num_picture], coord, 3), analysis.list_pixels)) != 1: # start moved (see check_apexCoord_newPic)
+        return False
+    foreign = msh.PixelList()
+    photography_zone_comparison(pictures[num_picture-1], pictures[num_picture], analysis.list_pixels, foreign, end[2], offset)
+    return not any(msh.Coordinates(x, y) in foreign for x, y in first.tolist())
+
+def _same_reads(list_pixels, known, depth, absent, present, pixels):
+    """
+    Returns True if the pixels read by a process of :func:`track_apex_parallel` (see :class:`_RecordedPixels`) are the same in 'list_pixels' as in the ones it knew, 'known':
+    the same last 'depth' pixels, none of the pixels 'absent' and all the pixels 'present' but the ones it found, 'pixels'.
+    """
+    
+    if len(known) != len(list_pixels) and min(len(known), len(list_pixels)) <= 9*9: # the lengths compared to the end of a hypha (see shift_correction) may differ
+        return False
+    if depth > len(list_pixels) or not np.array_equal(_pixel_array(list_pixels[len(list_pixels)-depth:]), known[len(known)-depth:]):
+        return False
+    if any(msh.Coordinates(x, y) in list_pixels for x, y in absent.tolist()):
+        return False
+    found = {msh.Coordinates(x, y) for x, y in pixels.tolist()}
+    return all(coord in list_pixels or coord in found for coord in (msh.Coordinates(x, y) for x, y in present.tolist()))
+
+def _pixel_array(pixels):
+    """
+    Returns the (x, y) of a list of :class:`Coordinates` as an array, which is quickly sent to another process.
+    """
+    
+    return np.array([(pixel.x, pixel.y) for pixel in pixels], dtype=np.int32).reshape(-1, 2)
+
+class _RecordedPixels(msh.PixelList):
+    """
+    Pixel list of a process of :func:`track_apex_parallel` recording how the pixels known when the branch started are read, 
+    so that the branch can be checked against the pixels found meanwhile by the other branches (see :func:`_same_reads`).
+    """
+    
+    def __init__(self, pixels=()):
+        """
+        Class constructor.
+        """
+        
+        super().__init__(pixels)
+        self.known = len(self) # number of pixels known when the branch started
+        self.depth = 0 # number of known pixels read or replaced by their index, from the last one
+        self.absent = set() # pixels looked for and not found
+        self.present = set() # pixels looked for and found
+        
+    def _read(self, index):
+        if isinstance(index, slice):
+            first = min(range(*index.indices(len(self._pixels))), default=self.known)
+        else:
+            first = index + len(self._pixels) if index < 0 else index
+        self.depth = max(self.depth, self.known - first)
+        
+    def __getitem__(self, index):
+        self._read(index)
+        return super().__getitem__(index)
+    
+    def __setitem__(self, index, coord):
+        self._read(index)
+        super().__setitem__(index, coord)
+        
+    def __delitem__(self, index):
+        self._read(index)
+        super().__delitem__(index)
         
-    return ("Analysis ended.", True)
+    def insert(self, index, coord):
+        self._read(slice(index, None))
+        super().insert(index, coord)
         
+    def __contains__(self, coord):
+        found = super().__contains__(coord)
+        (self.present if found else self.absent).add(coord)
+        return found
+    
+    def __iter__(self):
+        self.depth = self.known
+        return super().__iter__()
+    
+    def tail(self):
+        """
+        Returns the pixels of the list from the first known pixel read.
+        """
+        
+        return self._pixels[self.known-self.depth:]
+
+def _init_worker(frames, walker, offsets, startImg, endImg):
+    """
+    Keeps the frames and the settings of the analysis in a process of :func:`track_apex_parallel`.
+    """
+    
+    _workerState.update(frames=frames, walker=walker, offsets=offsets, startImg=startImg, endImg=endImg)
+
+def _explore_task(task):
+    """
+    Follows a branch in a process of :func:`track_apex_parallel`.
+    The task is (image index, abscissa, ordinate, id of the previous segment, (x, y) of the known pixels, end of the previous hypha or None (see :func:`_start_branch`)), 
+    the result is (error, id of the first segment, segments, steps, (x, y) of the pixels from the first known one read, number of known pixels read, 
+    (x, y) of the pixels looked for and not found, (x, y) of the ones found, (x, y) of the ones not found on the first image, end of the branch, siblings).
+    """
+    
+    num_picture, x, y, previous_id, known, start = task
+    analysis = msh.Analysis(None, _workerState['startImg'])
+    analysis.endImg = _workerState['endImg']
+    analysis.list_pixels = _RecordedPixels(msh.Coordinates(px, py) for px, py in known.tolist())
+    coord = msh.Coordinates(x, y)
+    segment, state = _start_branch(analysis, previous_id, num_picture, coord, start)
+    root_id = segment.id
+    siblings = []
+    branch = explore_branch(_workerState['frames'], analysis, segment, num_picture, coord, 
+                            _workerState['walker'], _workerState['offsets'], siblings, state)
+    first = set() # the pixels looked for on the first image (see _same_start)
+    try:
+        next(branch)
+        first = set(analysis.list_pixels.absent)
+        while True:
+            next(branch) # the events stay in the process
+    except StopIteration as stop:
+        error = stop.value
+    pixels = analysis.list_pixels
+    steps = [analysis.steps[num_step] for num_step in sorted(analysis.steps)]
+    end = (state.num_picture, state.check, state.previous)
+    return (error, root_id, list(analysis.segments.values()), steps, _pixel_array(pixels.tail()), pixels.depth, 
+            _pixel_array(pixels.absent), _pixel_array(pixels.present), _pixel_array(first), end, siblings)
+
 def list_hypha_creation(segments):
     """
     Method allowing the construction of a dictionary of hyphae, 
@@ -239,6 +796,242 @@ def picture_analyze(picture, list_pixels, list_foreign_pixel, coord):
         else: # if the temporary list contains more than 2 pixels, that means that there is an artefact in that emplacement on the image.
             return ("Artefact", list_pixels[-1], None, None, len(list_pixels_segment))
                 
+class SkeletonFrame:
+    """
+    Class representing a skeleton image in memory with 1 bit per pixel (white or not), 8 times smaller than the image.
+    Its areas are extracted like those of an array (frame[rows, columns]) without unpacking the whole image.
+    
+    :param shape: the number of rows and columns of the image
+    :type shape: (int, int)
+    :param numpy.ndarray bits: the white pixels packed row by row (see numpy.packbits)
+    """
+    
+    def __init__(self, array):
+        """
+        Class constructor.
+        
+        :param array: the pixels of the skeleton image (rows are ordinates, columns are abscissae), or the image read by areas
+        :type array: numpy.ndarray or InOut.TiledFrame
+        """
+        
+        self.shape = tuple(array.shape)
+        if isinstance(array, np.ndarray):
+            self.bits = np.packbits(array == 255, axis=1)
+        else: # packed band by band, without decoding the whole image
+            self.bits = np.empty((self.shape[0], (self.shape[1]+7)//8), dtype=np.uint8)
+            for row, rows in _bands(array):
+                self.bits[row:row+rows] = np.packbits(array[row:row+rows, 0:self.shape[1]] == 255, axis=1)
+        
+    @property
+    def nbytes(self):
+        return self.bits.nbytes
+        
+    def __getitem__(self, area):
+        rows, columns = area
+        start, stop, _ = columns.indices(self.shape[1])
+        width = max(stop-start, 0)
+        bits = np.unpackbits(self.bits[rows, start//8:(start+width+7)//8], axis=1)
+        return bits[:, start%8:start%8+width] * np.uint8(255)
+    
+    def unpack(self):
+        """
+        Unpacks the whole image.
+        
+        :return: the pixels of the image, 255 for the white ones and 0 for the others
+        :rtype: numpy.ndarray
+        """
+        
+        return np.unpackbits(self.bits, axis=1, count=self.shape[1]) * np.uint8(255)
+        
+def pack_skeleton(img):
+    """
+    Method that converts a skeleton image into a :class:`SkeletonFrame`.
+    
+    :param img: the skeleton image, its pixels, or the image read by areas
+    :type img: Image, numpy.ndarray, SkeletonFrame or InOut.TiledFrame
+    :return: the bit-packed image
+    :rtype: SkeletonFrame
+    """
+    
+    if isinstance(img, SkeletonFrame):
+        return img
+    if hasattr(img, 'shape'): # an array, or an image read by areas (InOut.TiledFrame)
+        return SkeletonFrame(img)
+    return SkeletonFrame(_image_array(img)) # converted apart from the cache of the frames, which is shared with the decoding threads
+
+def picture_array(picture):
+    """
+    Method that converts a skeleton image into a 2D 'uint8' array (rows are ordinates, columns are abscissae).
+    The conversion is done only once per image: the last :data:`FRAME_CACHE_SIZE` converted images are kept in a cache.
+    The images read by areas are unpacked for the caller only, and never kept whole in the cache.
+    
+    :param picture: an image tuple (skeleton) and its name
+    :type picture: list[Image, str]
+    :return: the pixels of the image
+    :rtype: numpy.ndarray
+    """
+    
+    array = _cached_frame(picture)[1]
+    if array is None: # image read by areas
+        return picture[0].unpack()
+    return array
+
+def _cached_frame(picture):
+    """
+    Returns the cache entry (Image, ndarray, {derived data}) of a skeleton image, converting the image if needed.
+    """
+    
+    img = picture[0]
+    key = id(img)
+    cached = _frameCache.get(key)
+    if cached is not None and cached[0] is img: # the id is only valid as long as the image is alive, hence the identity check
+        _frameCache.move_to_end(key)
+        return cached
+    
+    if isinstance(img, np.ndarray): # already converted
+        array = img
+    elif hasattr(img, 'unpack'): # image read by areas (SkeletonFrame, InOut.TiledFrame): only the data derived from it are kept
+        array = None
+    else:
+        array = _image_array(img)
+    cached = (img, array, {}) # the data derived from the image are only computed when needed
+    _frameCache[key] = cached
+    if len(_frameCache) > FRAME_CACHE_SIZE:
+        _frameCache.popitem(last=False) # we forget the least recently used image
+    return cached
+
+def _bands(img):
+    """
+    Returns the first row and the number of rows of the successive bands of an image read by areas, handled one by one when the whole image is needed.
+    The bands are made of whole rows of tiles (see :class:`InOut.TiledFrame`).
+    """
+    
+    height = getattr(img, 'tileShape', (1, 1))[0]
+    height *= max(1, BAND_ROWS // height)
+    return [(row, min(height, img.shape[0]-row)) for row in range(0, img.shape[0], height)]
+
+def _image_array(img):
+    """
+    Converts a skeleton image into an array, binary ('1') skeletons being converted so that white pixels are 255.
+    """
+    
+    if img.mode != 'L':
+        return np.asarray(img.convert('L'), dtype=np.uint8)
+    return np.asarray(img, dtype=np.uint8)
+
+def frame_data(picture, name, compute):
+    """
+    Method that computes data derived from a skeleton image (topology map, graph...) only once per image.
+    The data are kept in the cache along with the image array.
+    
+    :param picture: an image tuple (skeleton) and its name
+    :type picture: list[Image, str]
+    :param str name: the name of the data
+    :param compute: the function computing the data from the image array
+    :type compute: function(numpy.ndarray)
+    :return: the data
+    """
+    
+    derived = _cached_frame(picture)[2]
+    if name not in derived:
+        derived[name] = compute(picture_array(picture))
+    return derived[name]
+
+def topology_map(picture):
+    """
+    Method that labels every pixel of a skeleton image according to its number of white neighbours 
+    (:data:`BACKGROUND`, :data:`ENDPOINT`, :data:`PATH`, :data:`JUNCTION`, :data:`CLUSTER` or :data:`ISOLATED`).
+    The neighbours of all the pixels are counted at once, and the map is computed only once per image.
+    
+    :param picture: an image tuple (skeleton) and its name
+    :type picture: list[Image, str]
+    :return: the label of each pixel of the image
+    :rtype: numpy.ndarray
+    """
+    
+    return frame_data(picture, "topology", topology_labels)
+
+def topology_labels(array):
+    """
+    Method that computes the topology map of an array of pixels of a skeleton image, without keeping it (see :func:`topology_map`).
+    
+    :param numpy.ndarray array: the pixels of the skeleton image
+    :return: the label of each pixel
+    :rtype: numpy.ndarray
+    """
+    
+    white = array == 255
+    height, width = white.shape
+    padded = np.pad(white, 1).view(np.uint8) # the pixels out of the image are black
+    counts = np.zeros(white.shape, dtype=np.uint8)
+    for dy in (0, 1, 2):
+        for dx in (0, 1, 2):
+            if dx != 1 or dy != 1: # the pixel itself is not its own neighbour
+                counts += padded[dy:dy+height, dx:dx+width]
+    labels = np.minimum(counts, CLUSTER)
+    labels[counts == 0] = ISOLATED
+    labels[~white] = BACKGROUND
+    return labels
+
+def find_endpoints(picture, coord=None, size=None):
+    """
+    Method that looks for the white pixels having a single white neighbour (:data:`ENDPOINT`).
+    
+    :param picture: an image tuple (skeleton) and its name
+    :type picture: list[Image, str]
+    :param Coordinates coord: :class:`Coordinates` of the center of the area to look in, None to look in the whole image
+    :param int size: size of the area to look in
+    :return: the :class:`Coordinates` of the end pixels, sorted by abscissa then by ordinate
+    :rtype: list[Coordinates]
+    """
+    
+    if coord != None and hasattr(picture[0], 'shape'): # image read by areas: the map is only computed around the area
+        around, x, y = window(picture, coord, size+2) # the neighbours of the border pixels of the area are needed
+        labels, xArea, yArea = window((topology_labels(around), None), msh.Coordinates(int(coord.x)-x, int(coord.y)-y), size)
+        return _mask_coordinates(labels == ENDPOINT, x+xArea, y+yArea)
+    if coord == None and hasattr(picture[0], 'unpack'): # whole image read by areas: the map is computed band by band
+        img = picture[0]
+        endpoints = []
+        for row, rows in _bands(img):
+            top = max(row-1, 0) # the neighbours of the border pixels of the band are needed
+            labels = topology_labels(img[top:row+rows+1, 0:img.shape[1]])[row-top:row-top+rows]
+            endpoints.extend(_mask_coordinates(labels == ENDPOINT, 0, row))
+        return sorted(endpoints, key=lambda coord: (coord.x, coord.y))
+    
+    labels = topology_map(picture)
+    x, y = 0, 0
+    if coord != None:
+        labels, x, y = window((labels, None), coord, size)
+    return _mask_coordinates(labels == ENDPOINT, x, y)
+
+def window(picture, coord, size):
+    """
+    Method that extracts the square area of the matrix of the given size centered on the :class:`Coordinates` received.
+    The area is cropped to the image borders.
+    
+    :param picture: an image tuple (skeleton) to analyze and its name, or an array of pixels and None
+    :type picture: list[Image or SkeletonFrame or InOut.TiledFrame, str] or (numpy.ndarray, None)
+    :param Coordinates coord: :class:`Coordinates` of the center of the area
+    :param int size: size of the matrix (an even size is transformed in the next uneven size)
+    :return: the pixels of the area and the :class:`Coordinates` of its upper left corner
+    :rtype: (numpy.ndarray, int, int)
+    """
+    
+    if hasattr(picture[0], 'shape'): # an array, or an image read by areas (only the area is unpacked or decoded)
+        array = picture[0]
+    else:
+        array = picture_array(picture)
+    half = size//2 # an even matrix is transformed in an uneven matrix
+    x = int(coord.x)-half # abscissa of the upper left corner of the matrix
+    y = int(coord.y)-half # ordinate of the upper left corner of the matrix
+    xStart = max(x, 0)
+    yStart = max(y, 0)
+    xEnd = min(x+2*half+1, array.shape[1])
+    yEnd = min(y+2*half+1, array.shape[0])
+    if xStart >= xEnd or yStart >= yEnd: # the area is completely out of the image
+        return (array[0:0, 0:0], xStart, yStart)
+    return (array[yStart:yEnd, xStart:xEnd], xStart, yStart)
+
 def check_point(picture, coord, size):
     """
     Method that will analyze the pixels around the :class:`Coordinates` received in the parameters of the pixel of the image.
@@ -250,32 +1043,28 @@ def check_point(picture, coord, size):
     :type picture: list[Image, str]
     :param Coordinates coord: :class:`Coordinates` of the pixel to analyze
     :param int size: size of the matrix  
-    :return: a list of all the white pixels coordinates of the area
+    :return: a list of all the white pixels coordinates of the area, sorted by abscissa then by ordinate
     :rtype: list[Coordinates]
      
     .. codeauthor:: Sébastien Maillos
     """
     
-    liste_temp = [] # create a temporary list to store the coordinates of the white pixels found during the analysis.
+    area, x, y = window(picture, coord, size)
+    return _mask_coordinates(area == 255, x, y) # the white pixels are listed abscissa by abscissa
+
+def is_white(picture, coord):
+    """
+    Method that checks if the pixel at the given :class:`Coordinates` is white.
     
-    if size%2 == 0:
-        x = (coord.x)-size/2 # coordinates x of the last pixel of the list.
-        y = (coord.y)-size/2 # coordinates y of the last pixel of the list.
-        sizeM = size+1 # if the size of the matrix is even, it's transformed in an uneven matrix.
-    else:
-        x = (coord.x)-(size-1)/2 # coordinates x of the last pixel of the list.
-        y = (coord.y)-(size-1)/2 # coordinates y of the last pixel of the list. 
-        sizeM = size
+    :param picture: an image tuple (skeleton) and its name 
+    :type picture: list[Image, str]
+    :param Coordinates coord: :class:`Coordinates` of the pixel to check
+    :return: True if the pixel is in the image and white, False otherwise
+    :rtype: bool
+    """
     
-    i = 0
-    while i < sizeM: # travels all the abscissae of the matrix.
-        j = 0
-        while j < sizeM: # travels all the ordinates of the matrix.
-            if picture[0].getpixel((x+i, y+j)) == 255: # if a pixel is white, we add it to the temporary list sent.
-                liste_temp.append(msh.Coordinates(x+i, y+j))
-            j += 1
-        i += 1
-    return liste_temp
+    area = window(picture, coord, 1)[0]
+    return area.size == 1 and area[0, 0] == 255
 
 def check_apexCoord_newPic(picture1, picture2, list_pixels, coord):
     """
@@ -300,16 +1089,18 @@ def check_apexCoord_newPic(picture1, picture2, list_pixels, coord):
     # If the pixel is still on the new image
     # Only if one or zero are unknown, then we can launch the analysis (the 2 pixels that we need for the analysis are on the right position).
     # :class:`Coordinates`If 2 pixels or more are unknown, I launch the rewriting of the end of the hypha function on the new image.
-    if picture2[0].getpixel((coord.x, coord.y)) == 255 :
+    if is_white(picture2, coord):
         if len(list_temp) == 1 :
             return ("Start analyzing", coord)
         else:
             list_temp = check_point(picture2, coord, 3)
             list_temp = delete_pixel_same(list_temp, [coord])
-            for ele1 in list_pixels:
-                if ele1 != coord:
-                    for ele2 in list_temp:
-                        if three_pixels(ele1.x, ele2.x, 1) == True and three_pixels(ele1.y, ele2.y, 1) == True :
+            # We look for a pixel of the area at 1 pixel from an already found pixel (other than coord): only the 3x3 square around it needs to be checked.
+            for ele2 in list_temp:
+                for dx in (-1, 0, 1):
+                    for dy in (-1, 0, 1):
+                        ele1 = msh.Coordinates(ele2.x+dx, ele2.y+dy)
+                        if ele1 != coord and ele1 in list_pixels:
                             list_pixels.append(ele2)
                             return ("Start analyzing", coord)
 
@@ -338,17 +1129,9 @@ def connect_pixelCoord_newPic(picture, liste_pixel, coord):
 
     liste_temp = check_point(picture, coord, 21)
     
-    # travels the two lists (temporary and received) and delete from the temporary list all the unknown pixels (in the received list).
-    temp = []
-    i = 0
-    while i < len(liste_temp):
-        for coordPx in liste_pixel:
-            if (not liste_temp) == False:
-                if (liste_temp[i].x == coordPx.x) and (liste_temp[i].y == coordPx.y):
-                    temp.append(liste_temp[i])
-        i += 1
-    
-    liste_temp = temp # liste_temp now contains all the known pixels of the matrix to analyze.
+    # delete from the temporary list all the unknown pixels (not in the received list).
+    known = liste_pixel if isinstance(liste_pixel, msh.PixelList) else set(liste_pixel)
+    liste_temp = [px for px in liste_temp if px in known] # liste_temp now contains all the known pixels of the matrix to analyze.
     
     if not liste_temp:
         return None
@@ -373,13 +1156,11 @@ def connect_pixelCoord_newPic(picture, liste_pixel, coord):
             # We check that the first pixel in liste_pixel is also present in liste_temp.
             for ipx in range(len(liste_pixel)):
                 if (not liste_temp) == False:
-                    if (liste_temp[i].x == liste_pixel[ipx].x) and (liste_temp[i].y == liste_pixel[ipx].y):
+                    if liste_temp[i] == liste_pixel[ipx]:
                         position_liste_pixel1 = ipx
-                        # We then check if the previous pixel in liste_pixel is present also in liste_temp.
-            for ipx in range(len(liste_temp)):
-                if (not liste_temp) == False:
-                    if (liste_pixel[position_liste_pixel1-1].x == liste_temp[ipx].x) and (liste_pixel[position_liste_pixel1-1].y == liste_temp[ipx].y):
-                        position_liste_pixel2 = position_liste_pixel1-1
+            # We then check if the previous pixel in liste_pixel is present also in liste_temp.
+            if liste_pixel[position_liste_pixel1-1] in liste_temp:
+                position_liste_pixel2 = position_liste_pixel1-1
             # If the two positions are known then at it's the end of the search, otherwise we try again.
             if (position_liste_pixel1 and position_liste_pixel2) != -1:
                 break
@@ -412,68 +1193,161 @@ def delete_pixel_same(list1, list2):
     :param list1: pixels list
     :type list1: list[Coordinates]
     :param list2: pixels list
-    :type list2: list[Coordinates]
+    :type list2: list[Coordinates] or PixelList
     :return: a list of all the :class:`Coordinates` of unknown pixels in list2
     :rtype: list[Coordinates] 
     
     .. codeauthor:: Sébastien Maillos
     """
     
-    i = 0
-    while i < len(list1):
-        stop = False
-        for coordPx in list2:
-            if (not list1) == False and stop == False and list1[i].x == coordPx.x and list1[i].y == coordPx.y:
-                del list1[i]
-                stop = True # Avoid list2 of being once again traveled.
-                i -= 1
-        i += 1
+    # The membership tests are done in constant time on a PixelList or a set.
+    known = list2 if isinstance(list2, (msh.PixelList, set, frozenset)) else set(list2)
+    list1[:] = [coordPx for coordPx in list1 if coordPx not in known]
     return list1
 
-def photography_zone_comparison(picture1, picture2, list_pixels, list_foreign_pixel, coord):
+def photography_zone_comparison(picture1, picture2, list_pixels, list_foreign_pixel, coord, offset=None):
     """
-    Method that "captures" an area of 120 pixel of radius around a point (coord) on an image, then checks all the pixels that don't belong to the analyzed hypha.
+    Method that "captures" an area of 100 pixel of radius around a point (coord) on an image, then checks all the pixels that don't belong to the analyzed hypha.
     Then, it "captures" the same area on a new image to tell where the pixels that don't belong to the currently analysed hypha are located (and adds them to list_foreign_pixel).
+    The pixels of the new image are located with a mask of the foreign pixels of the first image dilated by 3 pixels.
     
     :param picture1: an image tuple (skeleton) of the first image to analyze and its name
     :type picture1: list[Image, str] 
     :param picture2: an image tuple (skeleton) of the second image to analyze and its name
     :type picture2: list[Image, str]
     :param list_pixels: already found pixels :class:`Coordinates` list 
-    :type list_pixels: list[Coordinates]
+    :type list_pixels: PixelList
     :param list_foreign_pixel:  :class:`Coordinates` list of a known pixel that don't belong to the currently analyzed hypha
-    :type list_foreign_pixel: list[Coordinates]
+    :type list_foreign_pixel: PixelList
     :param Coordinates coord: :class:`Coordinates` of the pixel to analyze  
+    :param Coordinates offset: the drift of the second image compared to the first one, None if there is none
     
     .. codeauthor:: Sébastien Maillos
     .. codeauthor:: Salomé Attar
     """
     
-    # check the white pixels in a radius of 120 around the coord on the previous image.
-    list_temp = check_point(picture1, coord, 201)
+    if offset == None:
+        offset = msh.Coordinates(0, 0)
+    # check the white pixels in a radius of 100 around the coord on the previous image.
+    area1, x, y = window(picture1, coord, 201)
+    area2, x2, y2 = window(picture2, coord + offset, 201)
+    list_temp = _mask_coordinates(area1 == 255, x, y)
     # Delete from the list all the pixels are known from the hypha.
     list_temp = delete_pixel_same(list_temp, list_pixels)
-    # Delete from the list all the known pixels that don't belong to the hypha.
-    # list_temp=delete_pixel_same(list_temp,list_foreign_pixel)
     
     # Add the found pixels to list_foreign_pixel.
     if len(list_temp) > 0:
+        foreign = np.zeros(area1.shape, dtype=bool) # mask of the pixels that don't belong to the hypha
+        for ele in list(list_foreign_pixel) + list_temp:
+            i, j = int(ele.x)-x, int(ele.y)-y
+            if 0 <= j < foreign.shape[0] and 0 <= i < foreign.shape[1]:
+                foreign[j, i] = True
         for ele in list_temp:
             list_foreign_pixel.append(ele)
-        # Check all the white pixels on the new image.
-        list_temp = check_point(picture2, coord, 201)
-    
-        # Copy list_foreign_pixel to travel it and be able to modify it without having to impact the loop "for".
-        copy_list_foreign_pixel = []
-        for ele in list_foreign_pixel:
-            copy_list_foreign_pixel.append(ele)
         
-        for ele1 in list_temp:
-            for ele2 in copy_list_foreign_pixel:
-                # Check if from those pixels there is some at a (max) 3 pixel radius of distance.
-                if three_pixels(ele1.x, ele2.x, 3) == True and three_pixels(ele1.y, ele2.y, 3) == True:
-                    # Then we add them to list_foreign_pixel
-                    list_foreign_pixel.append(ele1)
+        # The white pixels of the new image at a (max) 3 pixel radius of distance of those pixels are added to list_foreign_pixel.
+        foreign = shift_mask(foreign, x+int(offset.x)-x2, y+int(offset.y)-y2, area2.shape) # same pixels, seen in the area of the new image
+        close = dilate(foreign, 3) & (area2 == 255)
+        for ele in _mask_coordinates(close, x2, y2):
+            list_foreign_pixel.append(ele)
+
+def _mask_coordinates(mask, x, y):
+    """
+    Returns the :class:`Coordinates` of the True pixels of a mask whose upper left corner is (x, y), sorted by abscissa then by ordinate.
+    """
+    
+    columns, rows = np.nonzero(mask.T)
+    return [msh.Coordinates(x+i, y+j) for i, j in zip(columns.tolist(), rows.tolist())]
+
+def shift_mask(mask, dx, dy, shape):
+    """
+    Method that moves a mask by (dx, dy) into a mask of the given shape. The pixels moved out of the new mask are lost.
+    
+    :param numpy.ndarray mask: a boolean mask
+    :param int dx: the shift along the abscissae
+    :param int dy: the shift along the ordinates
+    :param shape: the shape of the new mask
+    :type shape: (int, int)
+    :return: the moved mask
+    :rtype: numpy.ndarray
+    """
+    
+    result = np.zeros(shape, dtype=bool)
+    height = min(mask.shape[0], shape[0]-dy) - max(0, -dy)
+    width = min(mask.shape[1], shape[1]-dx) - max(0, -dx)
+    if height > 0 and width > 0:
+        ySrc, xSrc = max(0, -dy), max(0, -dx)
+        result[ySrc+dy:ySrc+dy+height, xSrc+dx:xSrc+dx+width] = mask[ySrc:ySrc+height, xSrc:xSrc+width]
+    return result
+
+def frame_offsets(pictures, max_shift=20):
+    """
+    Method that computes the drift of each skeleton image compared to the previous one by phase correlation.
+    The drift of an image is searched within 'max_shift' pixels, 
+    the images being compared on an area of :data:`REGISTRATION_SIZE` pixels side at most, in their centre.
+    
+    :param pictures: list of successive hyphae growth images
+    :type pictures: list[Image, str]
+    :param int max_shift: the maximal drift between two successive images, in pixels
+    :return: the drift of each image compared to the previous one (no drift for the first one)
+    :rtype: list[Coordinates]
+    """
+    
+    offsets = [msh.Coordinates(0, 0)] if pictures else []
+    previous = None
+    for i in range(1, len(pictures)):
+        array1 = _registration_area(pictures[i-1])
+        array2 = _registration_area(pictures[i])
+        if array1.shape != array2.shape:
+            offsets.append(msh.Coordinates(0, 0)) # images of different sizes can't be compared
+            previous = None
+            continue
+        if previous is None:
+            previous = np.fft.rfft2(array1.astype(np.float32))
+        spectrum = np.fft.rfft2(array2.astype(np.float32))
+        cross = spectrum * np.conj(previous)
+        cross /= np.abs(cross) + 1e-9
+        correlation = np.fft.irfft2(cross, s=array1.shape)
+        # The peak is searched among the shifts of at most max_shift pixels (the negative shifts are at the end of the axes).
+        shifts = list(range(-max_shift, max_shift+1))
+        around = correlation[np.ix_(shifts, shifts)]
+        dy, dx = np.unravel_index(np.argmax(around), around.shape)
+        offsets.append(msh.Coordinates(shifts[dx], shifts[dy]))
+        previous = spectrum
+    return offsets
+
+def _registration_area(picture):
+    """
+    Returns the pixels of the area in the centre of an image compared by :func:`frame_offsets`.
+    """
+    
+    source = picture[0] if hasattr(picture[0], 'shape') else picture_array(picture)
+    height, width = source.shape[:2]
+    y = max((height-REGISTRATION_SIZE)//2, 0)
+    x = max((width-REGISTRATION_SIZE)//2, 0)
+    return np.asarray(source[y:y+REGISTRATION_SIZE, x:x+REGISTRATION_SIZE])
+
+def dilate(mask, ray):
+    """
+    Method that performs the binary dilation of a mask by a square of size 2*ray+1: 
+    a pixel is True in the result if there is a True pixel at a (max) 'ray' pixel radius of distance in the mask.
+    
+    :param numpy.ndarray mask: a boolean mask
+    :param int ray: the radius of the dilation
+    :return: the dilated mask
+    :rtype: numpy.ndarray
+    """
+    
+    # The square being separable, the mask is dilated along the ordinates, then along the abscissae.
+    result = mask.copy()
+    for d in range(1, ray+1):
+        result[d:, :] |= mask[:-d, :]
+        result[:-d, :] |= mask[d:, :]
+    columns = result.copy()
+    for d in range(1, ray+1):
+        result[:, d:] |= columns[:, :-d]
+        result[:, :-d] |= columns[:, d:]
+    return result
 
 def three_pixels(x1, x2, ray):
     """
@@ -593,6 +1467,7 @@ def shift_correction(picture1, picture2, list_pixels, coord):
 def init_list_pixels(list_pixels, picture, coord):    
     """
     Method that initializes list_pixel by filling it with the 7 pixels of end that follow the selected apex.
+    Nothing is added if the skeleton ends before them (a fragment too short to be a hypha).
     
     :param list_pixel: a pixel list
     :type list_pixel: list[Coordinates]
@@ -603,23 +1478,23 @@ def init_list_pixels(list_pixels, picture, coord):
     .. codeauthor:: Sébastien Maillos
     """
     
-    # We look in a radius of 10 around the selected point.
-    list_temp = check_point(picture, coord, 21)
-    
-    for px in list_temp:
-        if len(check_point(picture, px, 3)) == 2:
-            coord = px
-            i = 0
-            while i < 8:
-                list_pixels.append(px)
-                i += 1
-            i = 0
-            while i < 7:
-                list_pixel_temp = check_point(picture, list_pixels[-(1+i)], 3)
-                list_pixel_temp = delete_pixel_same(list_pixel_temp, list_pixels)
-                list_pixels[-(2+i)] = list_pixel_temp[0]
-                i += 1
-            break
+    # We look in a radius of 10 around the selected point for a pixel with a single neighbour.
+    for px in find_endpoints(picture, coord, 21):
+        coord = px
+        i = 0
+        while i < 8:
+            list_pixels.append(px)
+            i += 1
+        i = 0
+        while i < 7:
+            list_pixel_temp = check_point(picture, list_pixels[-(1+i)], 3)
+            list_pixel_temp = delete_pixel_same(list_pixel_temp, list_pixels)
+            if not list_pixel_temp: # dead end
+                del list_pixels[-8:]
+                return
+            list_pixels[-(2+i)] = list_pixel_temp[0]
+            i += 1
+        break
 
 def is_apex(picture, coord):
     """
@@ -635,17 +1510,10 @@ def is_apex(picture, coord):
     """
     
     # We check in a radius of 10 around the selected point.
-    list_temp = check_point(picture, coord, 21)
-    
-    # If the list is empty, no white pixel so no apex.
-    if not list_temp:
-        return (False, None)
-    # Otherwise, we travel list_temp and look in a radius of 1 for each point. 
-    # If there is only 2 white pixels, then we know that it is an apex for sure and we return its coordinates to start the analysis. 
-    else:
-        for px in list_temp:
-            if len(check_point(picture, px, 3)) == 2:
-                return (True, px)
+    # If a white pixel has a single white neighbour, then we know that it is an apex for sure and we return its coordinates to start the analysis. 
+    endpoints = find_endpoints(picture, coord, 21)
+    if endpoints:
+        return (True, endpoints[0])
     return (False, None)
 
 def calculated_size(segment):
@@ -0,0 +1,151 @@
+# -*- coding: utf-8 -*-
+
+# =============================================================================
+#     This module is part of TrackHypha, an application that analyzes the
+#     filamentous network of a mushroom by following one of its apex.
+#     Copyright (C)  2019  Salomé Attar,
+#                          Bouthayna Haltout,
+#                          Sébastien Maillos,
+#                          Laura Xénard
+#
+#     This program is free software: you can redistribute it and/or modify
+#     it under the terms of the GNU General Public License as published by
+#     the Free Software Foundation, either version 3 of the License, or
+#     (at your option) any later version.
+#
+#     This program is distributed in the hope that it will be useful,
+#     but WITHOUT ANY WARRANTY; without even the implied warranty of
+#     MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+#     GNU General Public License for more details.
+#
+#     You should have received a copy of the GNU General Public License
+#     along with this program. If not, see https://www.gnu.org/licenses/.
+# =============================================================================
+
+"""
+:Synopsis:
+    This module runs an analysis from the command line, without the graphical interface (and without loading PyQt),
+    for the scripts and the jobs of computing clusters::
+
+        python Batch.py PROJECT --apex X Y [--start N] [--end N] [--engine graph] [--export text,image,steps]
+        python Batch.py PROJECT --resume
+
+    The project directory holds the directories 'skeletons' and 'regMosaic' (see :func:`InOut.new_environment`).
+    The images are numbered from 1, as in the interface. The analysis is saved in the directory 'save' of the project,
+    and exported in its directory 'export' if asked. The modules of the analysis are only loaded once the arguments are checked.
+"""
+
+
+import sys
+import argparse
+
+
+EXPORTS = ('text', 'image', 'steps') # data that can be exported (see Management.Mana.export_project)
+
+
+def parse_arguments(argv):
+    """
+    Reads the arguments of the command line.
+
+    :param argv: the arguments, without the name of the program
+    :type argv: list[str]
+    :return: the arguments read
+    :rtype: argparse.Namespace
+    :raise SystemExit: if the arguments are wrong, or the help is asked
+    """
+
+    parser = argparse.ArgumentParser(prog="Batch.py", description="Follows the hyphae of a project without the graphical interface.")
+    parser.add_argument('path', help="the directory of the project, holding the directories 'skeletons' and 'regMosaic'")
+    apex = parser.add_mutually_exclusive_group(required=True)
+    apex.add_argument('--apex', nargs=2, type=int, metavar=('X', 'Y'), help="the coordinates of the apex to follow in the start image")
+    apex.add_argument('--all-apexes', action='store_true', help="follows all the apexes of the start image")
+    apex.add_argument('--resume', action='store_true', help="resumes the interrupted analysis of the save of the project")
+    parser.add_argument('--start', type=int, default=1, metavar='N', help="the number of the start image (default: 1)")
+    parser.add_argument('--end', type=int, metavar='N', help="the number of the end image (default: the last image)")
+    parser.add_argument('--engine', choices=('pixel', 'graph'), default='pixel', help="the tracking engine (default: pixel)")
+    parser.add_argument('--workers', type=int, default=1, help="the number of processes exploring the branches (default: 1)")
+    parser.add_argument('--export', default='', metavar='DATA',
+                        help="the data to export once the analysis is over, separated by commas among: " + ", ".join(EXPORTS))
+    parser.add_argument('--notes', default='', help="the notes written in the exported text")
+    arguments = parser.parse_args(argv)
+
+    arguments.export = [data for data in arguments.export.split(',') if data]
+    for data in arguments.export:
+        if data not in EXPORTS:
+            parser.error("argument --export: invalid choice: '{}' (choose from {})".format(data, ", ".join(EXPORTS)))
+    if arguments.workers < 1:
+        parser.error("argument --workers: at least 1 process is needed")
+    return arguments
+
+def prepare_analysis(manage, arguments):
+    """
+    Creates the project and its analysis from the arguments of the command line, like the interface does.
+
+    :param Mana manage: the :class:`Management.Mana` of the analysis
+    :param argparse.Namespace arguments: the arguments read (see :func:`parse_arguments`)
+    :return: a tuple of a boolean and a string indicating the success or failure of the preparation
+    :rtype: (bool, str)
+    """
+
+    import Mushroom as msh
+
+    if arguments.resume:
+        return manage.load_project(arguments.path + '/save/Project')
+
+    isOk, message = manage.new_project(arguments.path)
+    if not isOk:
+        return (isOk, message)
+    nbImg = len(manage.project.skelPics)
+    end = arguments.end if arguments.end != None else nbImg
+    if not 1 <= arguments.start <= end <= nbImg:
+        return (False, "The start and end images must be between 1 and {}, the start image first.".format(nbImg))
+
+    manage.project.currentImg = arguments.start-1
+    if arguments.all_apexes:
+        isOk, message = manage.select_all_apexes()
+        if not isOk:
+            return (isOk, message)
+    else:
+        isApex, coord = manage.check_apex(msh.Coordinates(*arguments.apex))
+        if not isApex:
+            return (False, "No apex has been found at ({}, {}) on the start image.".format(*arguments.apex))
+    manage.select_endImg(end-1)
+    return (True, message)
+
+def main(argv=None):
+    """
+    Runs the analysis asked on the command line, then saves and exports it. The messages are written on the standard output.
+
+    :param argv: the arguments, without the name of the program, None for those of the command line
+    :type argv: list[str]
+    :return: the exit status: 0 if the analysis has been run, 1 otherwise
+    :rtype: int
+    """
+
+    arguments = parse_arguments(sys.argv[1:] if argv == None else argv)
+
+    import Management # after the arguments, so that the help and the mistakes are shown at once
+
+    manage = Management.Mana()
+    isOk, message = prepare_analysis(manage, arguments)
+    print(message)
+    if not isOk:
+        return 1
+
+    if arguments.resume:
+        result = manage.resume(arguments.engine, arguments.workers, Management.CHECKPOINT_STEPS)
+    else:
+        result = manage.run(arguments.engine, arguments.workers, Management.CHECKPOINT_STEPS)
+    message, isOk = result if isinstance(result, tuple) else (result, False) # no analysis to resume
+    print(message)
+    if not isOk:
+        return 1
+
+    print(manage.save_project(incremental=True)) # the save resumed by --resume
+    if arguments.export:
+        print(manage.export_project(arguments.notes, 'text' in arguments.export, 'image' in arguments.export, 'steps' in arguments.export))
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,256 @@
+# -*- coding: utf-8 -*-
+
+# =============================================================================
+#     This module is part of TrackHypha, an application that analyzes the
+#     filamentous network of a mushroom by following one of its apex.
+#     Copyright (C)  2019  Salomé Attar,
+#                          Bouthayna Haltout,
+#                          Sébastien Maillos,
+#                          Laura Xénard
+#
+#     This program is free software: you can redistribute it and/or modify
+#     it under the terms of the GNU General Public License as published by
+#     the Free Software Foundation, either version 3 of the License, or
+#     (at your option) any later version.
+#
+#     This program is distributed in the hope that it will be useful,
+#     but WITHOUT ANY WARRANTY; without even the implied warranty of
+#     MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+#     GNU General Public License for more details.
+#
+#     You should have received a copy of the GNU General Public License
+#     along with this program. If not, see https://www.gnu.org/licenses/.
+# =============================================================================
+
+"""
+:Synopsis:
+    This module converts a skeleton image into a sparse graph and provides a tracking engine based on it,
+    which can be used by :func:`AI.play_analysis` instead of the pixel by pixel walk of :func:`AI.picture_analyze`.
+    The ends of the hyphae and the nodes (groups of touching pixels having 1, 3 or more neighbours) are the vertices of the graph,
+    and the chains of pixels linking them are its edges. This module contains two classes:
+
+        * Edge
+        * SkeletonGraph
+"""
+
+
+import numpy as np
+
+import Mushroom as msh
+import AI
+
+
+class Edge:
+    """
+    Class representing a chain of pixels linking two vertices of a :class:`SkeletonGraph`.
+
+    :param int start: the id of the start vertex
+    :param int end: the id of the end vertex
+    :param pixels: the polyline of the edge, from a pixel of the start vertex to a pixel of the end vertex
+    :type pixels: list[Coordinates]
+    :param int length: the length of the edge in pixels
+    """
+
+    def __init__(self, start, end, pixels):
+        """
+        Class constructor.
+        """
+
+        self.start = start
+        self.end = end
+        self.pixels = pixels
+        self.length = len(pixels)-1
+
+
+class SkeletonGraph:
+    """
+    Class representing the graph of a skeleton image.
+
+    :param vertices: the pixels of each vertex, the index in the list being the id of the vertex
+    :type vertices: list[list[Coordinates]]
+    :param edges: the edges of the graph
+    :type edges: list[Edge]
+    """
+
+    def __init__(self, array, labels):
+        """
+        Class constructor: builds the graph in a single pass on the white pixels of the image.
+
+        :param numpy.ndarray array: the pixels of the skeleton image
+        :param numpy.ndarray labels: the topology map of the image (see :func:`AI.topology_map`)
+        """
+
+        self.vertices = []
+        self.edges = []
+        self._white = set() # (x, y) of the white pixels
+        self._pixelVertex = {} # (x, y) : id of the vertex containing the pixel
+        self._pixelEdge = {} # (x, y) : (edge, index of the pixel in the polyline) for the pixels inside the edges
+        self._vertexPixels = [] # (x, y) of the pixels of each vertex
+
+        rows, columns = np.nonzero(array == 255)
+        self._white = set(zip(columns.tolist(), rows.tolist()))
+        rows, columns = np.nonzero((labels != AI.BACKGROUND) & (labels != AI.PATH))
+
+        # The touching end, node and isolated pixels are grouped in vertices.
+        for pixel in zip(columns.tolist(), rows.tolist()):
+            if pixel not in self._pixelVertex:
+                self._add_vertex(self._component(pixel))
+
+        # The chains of pixels are followed from each vertex.
+        for iVertex in range(len(self._vertexPixels)):
+            for pixel in self._vertexPixels[iVertex]:
+                for neighbour in self._neighbours(pixel):
+                    if neighbour not in self._pixelVertex and neighbour not in self._pixelEdge:
+                        self._trace(pixel, neighbour)
+
+        # The remaining chains are closed loops without any vertex: one of their pixels becomes a vertex.
+        for pixel in self._white:
+            if pixel not in self._pixelVertex and pixel not in self._pixelEdge:
+                self._add_vertex([pixel])
+                for neighbour in self._neighbours(pixel):
+                    if neighbour not in self._pixelVertex and neighbour not in self._pixelEdge:
+                        self._trace(pixel, neighbour)
+
+    def _neighbours(self, pixel):
+        """
+        Returns the (x, y) of the white neighbours of a pixel, sorted by abscissa then by ordinate.
+        """
+
+        x, y = pixel
+        return [(x+dx, y+dy) for dx in (-1, 0, 1) for dy in (-1, 0, 1)
+                if (dx != 0 or dy != 0) and (x+dx, y+dy) in self._white]
+
+    def _component(self, pixel):
+        """
+        Returns the vertex pixels touching the given vertex pixel, directly or not.
+        """
+
+        component = [pixel]
+        found = {pixel}
+        i = 0
+        while i < len(component):
+            for neighbour in self._neighbours(component[i]):
+                if neighbour not in found and neighbour not in self._pixelVertex and self._is_vertex(neighbour):
+                    found.add(neighbour)
+                    component.append(neighbour)
+            i += 1
+        return component
+
+    def _is_vertex(self, pixel):
+        return len(self._neighbours(pixel)) != 2
+
+    def _add_vertex(self, pixels):
+        iVertex = len(self.vertices)
+        for pixel in pixels:
+            self._pixelVertex[pixel] = iVertex
+        self._vertexPixels.append(pixels)
+        self.vertices.append([msh.Coordinates(x, y) for x, y in pixels])
+
+    def _trace(self, start, pixel):
+        """
+        Follows the chain of pixels beginning with the vertex pixel 'start' and the pixel 'pixel' until another vertex pixel, and adds the edge.
+        """
+
+        polyline = [start, pixel]
+        previous = start
+        while pixel not in self._pixelVertex:
+            self._pixelEdge[pixel] = None # visited, the edge is set below
+            following = [n for n in self._neighbours(pixel) if n != previous]
+            previous, pixel = pixel, following[0] # a closed loop ends when it comes back to 'start'
+            polyline.append(pixel)
+
+        edge = Edge(self._pixelVertex[start], self._pixelVertex[polyline[-1]], [msh.Coordinates(x, y) for x, y in polyline])
+        for i in range(1, len(polyline)-1):
+            self._pixelEdge[polyline[i]] = (edge, i)
+        self.edges.append(edge)
+
+    def neighbours(self, coord):
+        """
+        Method listing the white pixels of the 3x3 square centered on the given :class:`Coordinates` (including itself),
+        in the same order as :func:`AI.check_point`.
+
+        :param Coordinates coord: the :class:`Coordinates` of the center pixel
+        :return: the :class:`Coordinates` of the white pixels, sorted by abscissa then by ordinate
+        :rtype: list[Coordinates]
+        """
+
+        x, y = int(coord.x), int(coord.y)
+        return [msh.Coordinates(x+dx, y+dy) for dx in (-1, 0, 1) for dy in (-1, 0, 1) if (x+dx, y+dy) in self._white]
+
+    def follow(self, previous, coord):
+        """
+        Method listing the pixels of the edge going through the given pixel, from the pixel following it (coming from 'previous')
+        to the next vertex pixel.
+
+        :param Coordinates previous: the :class:`Coordinates` of the pixel we come from
+        :param Coordinates coord: the :class:`Coordinates` of a pixel inside an edge
+        :return: the next pixels of the edge, or an empty list if 'coord' is not inside an edge or 'previous' is not the pixel before it
+        :rtype: list[Coordinates]
+        """
+
+        located = self._pixelEdge.get((int(coord.x), int(coord.y)))
+        if located is None:
+            return []
+        edge, i = located
+        if edge.pixels[i-1] == previous:
+            return edge.pixels[i+1:]
+        elif edge.pixels[i+1] == previous:
+            return edge.pixels[i-1::-1]
+        return []
+
+
+def skeleton_graph(picture):
+    """
+    Method returning the :class:`SkeletonGraph` of a skeleton image. The graph is built only once per image.
+
+    :param picture: an image tuple (skeleton) and its name
+    :type picture: list[Image, str]
+    :return: the graph of the image
+    :rtype: SkeletonGraph
+    """
+
+    return AI.frame_data(picture, "graph", lambda array: SkeletonGraph(array, AI.topology_labels(array))) # only the graph is kept
+
+def graph_analyze(picture, list_pixels, list_foreign_pixel, coord):
+    """
+    Method analyzing the received image with its :class:`SkeletonGraph` to see the evolution of the apex.
+    It takes the same decisions as :func:`AI.picture_analyze`, but the chains of pixels between the nodes are followed in one go along the edges of the graph.
+
+    :param picture: image tuple (skeleton) to analyze and its name
+    :type picture: list[Image, str]
+    :param list_pixels: list of :class:`Coordinates` of the already found pixels
+    :type list_pixels: PixelList
+    :param list_foreign_pixel: known pixels :class:`Coordinates` list not linked to the hypha in the ongoing analysis
+    :type list_foreign_pixel: PixelList
+    :param Coordinates coord: coordinates of the pixel to analyze
+    :return: a tuple stating if what has been found is a node, an apex, or an artefact, and suitable :class:`Coordinates`
+    :rtype: (str, Coordinates, Coordinates, Coordinates, int)
+    """
+
+    if not list_pixels: # If the sent pixel list is empty, the analysis is impossible.
+         return ("Error, pixel list is void", None, None, None, None)
+
+    graph = skeleton_graph(picture)
+    length = 0 # number of pixels added to the segment
+    while(True):
+        liste_temp = [px for px in graph.neighbours(coord) if px not in list_pixels and px not in list_foreign_pixel]
+        if not liste_temp: # Apex
+            return ("Apex", list_pixels[-1], None, None, length)
+        elif len(liste_temp) == 2: # Node
+            list_pixels.append(liste_temp[0])
+            list_pixels.append(liste_temp[1])
+            return ("Node", list_pixels[-3], list_pixels[-2], list_pixels[-1], length+1)
+        elif len(liste_temp) > 2: # Artefact
+            return ("Artefact", list_pixels[-1], None, None, length)
+
+        previous, coord = coord, liste_temp[0]
+        list_pixels.append(coord)
+        length += 1
+        # Inside an edge, each pixel has only 2 neighbours: the one we come from (already found) and the next one.
+        # The hypha goes on as long as the next one is neither already found nor foreign.
+        for px in graph.follow(previous, coord):
+            if px in list_pixels or px in list_foreign_pixel:
+                return ("Apex", list_pixels[-1], None, None, length)
+            list_pixels.append(px)
+            length += 1
+            previous, coord = coord, px
@@ -31,15 +31,497 @@
 
 
 import os
+import io
+import time
+import zipfile
+import itertools
 import operator
 import datetime
+import json
+import hashlib
+import threading
+import collections.abc
+import concurrent.futures
 
 import pickle
 from PIL import Image, ImageDraw
-import tifffile as tiff
 import numpy as np
 
 import Mushroom as msh
+import AI
+
+
+IMAGE_BUDGET = 2 * 1024**3 # bytes of decoded images kept in memory by each ImageStore
+DECODE_WORKERS = os.cpu_count() or 1 # number of threads decoding the images when a project is loaded
+PREFETCH_WORKERS = 2 # number of threads of each ImageStore decoding in the background the images about to be used
+TILED_PIXELS = 8192 * 8192 # skeleton TIFF images larger than this are read by tiles (see TiledFrame)
+TILE_CACHE = 64 # number of decoded tiles kept in memory by each TiledFrame
+MAX_OPEN_FILES = 64 # number of TIFF files kept open by the FilePool of the module
+SAVE_FORMAT = 'TrackHypha project' # name of the format of the saves written by write_project
+SAVE_VERSION = 1 # version of the format of the saves, increased when it changes
+SAVE_NAME = 'Project' # name of the save of the 'save' directory written incrementally (see save_journal)
+JOURNAL_EXTENSION = '.journal' # extension of the journal of the incremental saves appended to a save
+JOURNAL_RECORDS = 64 # number of records appended to a journal before it is compacted into its save
+WATCH_SETTLE = 2 # seconds without modification after which a new image file is considered as completely written (see append_pictures)
+MANIFEST_NAME = 'manifest.json' # file of the 'save' directory describing the images of the project (see write_manifest)
+
+
+class FilePool:
+    """
+    Class representing a bounded set of open TIFF files, shared by the lists of images read from their files page by page or tile by tile.
+    A file is opened on its first read and kept open for the next ones, the least recently used files being closed beyond 'size' files.
+    
+    :param int size: the maximum number of files kept open
+    """
+    
+    def __init__(self, size=MAX_OPEN_FILES):
+        """
+        Class constructor.
+        """
+        
+        self.size = size
+        self._files = collections.OrderedDict() # path : (open TiffFile, lock of the file), in least recently used order
+        self._lock = threading.Lock()
+        
+    def __len__(self):
+        return len(self._files)
+    
+    def read(self, path, function):
+        """
+        Calls a function reading an open TIFF file, opening the file if needed. 
+        Each file is read by a single thread at a time.
+        
+        :param str path: the path of the TIFF file
+        :param function: the function receiving the open file
+        :type function: function
+        :return: the value returned by the function
+        """
+        
+        import tifffile as tiff # only loaded for the projects having TIFF images
+        
+        while True:
+            with self._lock:
+                entry = self._files.get(path)
+                if entry == None:
+                    entry = self._files[path] = (tiff.TiffFile(path), threading.Lock())
+                self._files.move_to_end(path)
+                closed = [self._files.popitem(last=False)[1] for i in range(len(self._files) - self.size)]
+            for file, lock in closed:
+                with lock: # the file is closed once read by the threads using it
+                    file.close()
+            file, lock = entry
+            with lock:
+                if not file.filehandle.closed: # otherwise closed by another thread in the meantime: opened again
+                    return function(file)
+    
+    def close(self):
+        """
+        Closes all the open files.
+        """
+        
+        with self._lock:
+            closed = list(self._files.values())
+            self._files.clear()
+        for file, lock in closed:
+            with lock:
+                file.close()
+
+FILES = FilePool() # open files of the images of the projects
+
+
+class ImageStore(collections.abc.Sequence):
+    """
+    Class representing a sorted list of tuples (img, img name) whose images are decoded from their files on first access only.
+    The decoded images are kept in memory within a budget of bytes, the least recently used ones being forgotten first.
+    
+    :param paths: the paths of the image files, in the order of the list
+    :type paths: list[str]
+    :param names: the names of the images
+    :type names: list[str]
+    :param str mode: the mode the images are converted into once decoded, None to keep their own mode
+    :param convert: the function turning each decoded image into the object kept in memory, None to keep the image
+    :type convert: function
+    :param int budget: the maximum number of bytes of the decoded images kept in memory (the last image used is always kept)
+    :param bool tiled: True if the very large TIFF images are read by tiles (see :class:`TiledFrame`) instead of being decoded
+    """
+    
+    def __init__(self, paths, mode=None, budget=IMAGE_BUDGET, convert=None, tiled=False):
+        """
+        Class constructor.
+        """
+        
+        self.paths = list(paths)
+        self.names = [os.path.basename(path) for path in self.paths]
+        self.mode = mode
+        self.budget = budget
+        self.convert = convert
+        self.tiled = tiled
+        self._images = collections.OrderedDict() # index : decoded Image, in least recently used order
+        self._bytes = 0
+        self._lock = threading.Lock() # the analysis thread and the window share the images
+        self._pending = {} # index : Future of an image being decoded in the background
+        self._wanted = set() # indices of the images asked for by the last call to prefetch
+        self._prefetcher = None # pool of threads decoding the images in the background
+        
+    def __len__(self):
+        return len(self.paths)
+    
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return [self[i] for i in range(*index.indices(len(self)))]
+        if index < 0:
+            index += len(self)
+        if not 0 <= index < len(self):
+            raise IndexError("image index out of range")
+        return (self.image(index), self.names[index])
+    
+    def image(self, index):
+        """
+        Returns an image of the list, decoding it if it is not in memory.
+        
+        :param int index: the index of the image
+        :return: the image
+        :rtype: Image
+        :raise OSError: if the image file can't be read
+        """
+        
+        with self._lock:
+            img = self._images.get(index)
+            if img is not None:
+                self._images.move_to_end(index)
+                return img
+            pending = self._pending.get(index)
+        
+        if pending is not None: # being decoded in the background
+            img = pending.result()
+            if img is not None:
+                return img
+        return self._keep(index, self._decode(index)) # the decoding is done outside of the lock
+    
+    def prefetch(self, indices):
+        """
+        Decodes images of the list in the background, so that they are in memory when they are asked for.
+        The images of the previous calls whose decoding hasn't started yet are dropped, unless they are asked for again.
+        
+        :param indices: the indices of the images about to be used, the first ones being decoded first
+        :type indices: iterable[int]
+        """
+        
+        indices = list(indices)
+        with self._lock:
+            self._wanted = {index for index in indices if 0 <= index < len(self)}
+            if self._prefetcher == None:
+                self._prefetcher = concurrent.futures.ThreadPoolExecutor(PREFETCH_WORKERS)
+            for index in indices:
+                if index in self._wanted and index not in self._images and index not in self._pending:
+                    self._pending[index] = concurrent.futures.Future()
+                    self._prefetcher.submit(self._prefetch_image, index)
+    
+    def _prefetch_image(self, index):
+        """
+        Decodes an image asked for by :meth:`prefetch` if it is still wanted, and gives it to the threads waiting for it.
+        """
+        
+        with self._lock:
+            wanted = index in self._wanted
+        img = None
+        if wanted:
+            try:
+                img = self._keep(index, self._decode(index))
+            except Exception: # the error is raised by image() when the image is asked for
+                img = None
+        with self._lock:
+            future = self._pending.pop(index)
+        future.set_result(img)
+    
+    def load(self, workers=DECODE_WORKERS):
+        """
+        Decodes the images of the list in advance on a pool of threads, in the order of the list, until the budget is full.
+        At most 2 images per thread are decoded at the same time, so that the memory used stays bounded.
+        
+        :param int workers: the number of threads
+        :return: the number of images in memory
+        :rtype: int
+        :raise OSError: if an image file can't be read
+        """
+        
+        with concurrent.futures.ThreadPoolExecutor(workers) as pool:
+            pending = collections.deque()
+            nextIndex = 0
+            while nextIndex < len(self) or pending:
+                while nextIndex < len(self) and len(pending) < 2*workers:
+                    pending.append((nextIndex, pool.submit(self._decode, nextIndex)))
+                    nextIndex += 1
+                index, future = pending.popleft()
+                img = future.result()
+                if self._bytes + image_bytes(img) > self.budget: # the next images would push the first ones out
+                    for index, future in pending:
+                        future.cancel()
+                    break
+                self._keep(index, img)
+        return len(self._images)
+    
+    def extend(self, paths):
+        """
+        Appends images at the end of the list, decoded on first access like the others.
+        
+        :param paths: the paths of the image files
+        :type paths: list[str]
+        """
+        
+        with self._lock:
+            self.paths.extend(paths)
+            self.names.extend(os.path.basename(path) for path in paths)
+    
+    def _decode(self, index):
+        """
+        Decodes an image of the list.
+        """
+        
+        if self.tiled and is_tiled_image(self.paths[index]):
+            return TiledFrame(self.paths[index])
+        with Image.open(self.paths[index]) as img: # the file is closed once the image is decoded
+            img.load()
+        if self.mode != None and img.mode != self.mode:
+            img = img.convert(self.mode)
+        if self.convert != None:
+            img = self.convert(img)
+        return img
+    
+    def _keep(self, index, img):
+        """
+        Keeps a decoded image in memory, forgetting the least recently used ones beyond the budget, and returns the image kept.
+        """
+        
+        with self._lock:
+            if index in self._images: # another thread has decoded it meanwhile
+                img = self._images[index]
+            else:
+                self._images[index] = img
+                self._bytes += image_bytes(img)
+            self._images.move_to_end(index)
+            while self._bytes > self.budget and len(self._images) > 1:
+                _, forgotten = self._images.popitem(last=False)
+                self._bytes -= image_bytes(forgotten)
+        return img
+
+
+class TiffStack(ImageStore):
+    """
+    Class representing the frames of a multipage TIFF file (a time-lapse stack) as a sorted list of tuples (img, img name), 
+    kept in memory like the images of an :class:`ImageStore`.
+    The frames are read from the memory-mapped file when it isn't compressed, page by page otherwise (through :data:`FILES`).
+    The function 'convert' receives the frames as arrays, without conversion into images.
+    
+    :param str path: the path of the TIFF file
+    """
+    
+    def __init__(self, path, mode=None, budget=IMAGE_BUDGET, convert=None):
+        """
+        Class constructor.
+        """
+        
+        count = FILES.read(path, lambda file: len(file.pages))
+        ImageStore.__init__(self, [path] * count, mode, budget, convert) # the frames of a stack are not read by tiles
+        name = os.path.basename(path)
+        self.names = ["{} #{:0{}d}".format(name, i+1, len(str(count))) for i in range(count)]
+        import tifffile as tiff
+        try:
+            self._frames = tiff.memmap(path) # the frames are read without copy
+        except ValueError: # compressed or scattered data
+            self._frames = None
+        
+    def _decode(self, index):
+        """
+        Reads a frame of the stack.
+        """
+        
+        if self._frames is not None:
+            array = self._frames[index]
+        else:
+            array = FILES.read(self.paths[index], lambda file: file.pages[index].asarray())
+        if array.dtype == bool:
+            array = array.view(np.uint8) * np.uint8(255)
+        if self.convert != None: # e.g. a skeleton is packed directly from the file data
+            return self.convert(array)
+        img = Image.fromarray(array)
+        if self.mode != None and img.mode != self.mode:
+            img = img.convert(self.mode)
+        return img
+
+
+class TiledFrame:
+    """
+    Class representing a very large skeleton TIFF image, whose tiles (or strips) are only decoded when an area overlapping them is read.
+    Its areas are read like those of an array (frame[rows, columns]), the last :data:`TILE_CACHE` decoded tiles being kept in memory.
+    The file is read through :data:`FILES`, so that it is not opened again for each area.
+    
+    :param str path: the path of the image file
+    :param shape: the number of rows and columns of the image
+    :type shape: (int, int)
+    """
+    
+    def __init__(self, path):
+        """
+        Class constructor.
+        """
+        
+        self.path = path
+        page = FILES.read(path, lambda file: file.pages[0])
+        height, width = page.shape[:2]
+        if page.is_tiled:
+            self._tileShape = (page.tilelength, page.tilewidth)
+        else: # the strips are tiles as wide as the image
+            self._tileShape = (min(page.rowsperstrip or height, height), width)
+        self.shape = (height, width)
+        self._tiles = collections.OrderedDict() # (row, column) : decoded tile, in least recently used order
+        self._lock = threading.Lock()
+        
+    @property
+    def nbytes(self):
+        return TILE_CACHE * self._tileShape[0] * self._tileShape[1] # at most
+    
+    @property
+    def tileShape(self):
+        return self._tileShape
+    
+    def __getitem__(self, area):
+        rows, columns = area
+        yStart, yEnd, _ = rows.indices(self.shape[0])
+        xStart, xEnd, _ = columns.indices(self.shape[1])
+        pixels = np.zeros((max(yEnd-yStart, 0), max(xEnd-xStart, 0)), dtype=np.uint8)
+        if pixels.size == 0:
+            return pixels
+        
+        tileHeight, tileWidth = self._tileShape
+        tiles = [(row, column) for row in range(yStart//tileHeight, (yEnd-1)//tileHeight+1) 
+                               for column in range(xStart//tileWidth, (xEnd-1)//tileWidth+1)]
+        for (row, column), tile in zip(tiles, self._read_tiles(tiles)):
+            y, x = row*tileHeight, column*tileWidth # upper left corner of the tile
+            y1, y2 = max(yStart, y), min(yEnd, y+tileHeight)
+            x1, x2 = max(xStart, x), min(xEnd, x+tileWidth)
+            pixels[y1-yStart:y2-yStart, x1-xStart:x2-xStart] = tile[y1-y:y2-y, x1-x:x2-x]
+        return pixels
+    
+    def unpack(self):
+        """
+        Decodes the whole image.
+        
+        :return: the pixels of the image
+        :rtype: numpy.ndarray
+        """
+        
+        return self[0:self.shape[0], 0:self.shape[1]]
+    
+    def _read_tiles(self, tiles):
+        """
+        Returns the given tiles, decoding those which are not in memory.
+        """
+        
+        with self._lock:
+            missing = [tile for tile in tiles if tile not in self._tiles]
+            if missing:
+                columns = -(-self.shape[1] // self._tileShape[1])
+                indices = [row*columns + column for row, column in missing]
+                page, segments = FILES.read(self.path, lambda file: self._read_segments(file, indices))
+                for tile, index, data in zip(missing, indices, segments):
+                    self._tiles[tile] = self._decode(page, index, data) # decoded once the file is released
+            found = []
+            for tile in tiles:
+                self._tiles.move_to_end(tile)
+                found.append(self._tiles[tile])
+            while len(self._tiles) > max(TILE_CACHE, len(tiles)):
+                self._tiles.popitem(last=False)
+        return found
+    
+    def _read_segments(self, file, indices):
+        """
+        Reads the encoded data of tiles of the image.
+        """
+        
+        page = file.pages[0]
+        segments = []
+        for index in indices:
+            file.filehandle.seek(page.dataoffsets[index])
+            segments.append(file.filehandle.read(page.databytecounts[index]))
+        return (page, segments)
+    
+    def _decode(self, page, index, data):
+        """
+        Decodes a tile of the image.
+        """
+        
+        if not data: # empty tile
+            return np.zeros(self._tileShape, dtype=np.uint8)
+        segment = page.decode(data, index, jpegtables=page.jpegtables)[0]
+        tile = segment.reshape(segment.shape[-3:-1]) # depth and samples are 1
+        if tile.dtype == bool:
+            tile = tile.view(np.uint8) * np.uint8(255)
+        return tile
+
+
+def is_tiled_image(path):
+    """
+    Checks that an image file is a TIFF image larger than :data:`TILED_PIXELS`, made of several tiles or strips of a single channel, 
+    so that it can be read by areas (see :class:`TiledFrame`).
+    
+    :param str path: the path of the image file
+    :return: True if the image can be read by tiles, False otherwise
+    :rtype: bool
+    """
+    
+    if os.path.splitext(path)[1] not in ('.tif', '.tiff'):
+        return False
+    page = FILES.read(path, lambda file: file.pages[0]) # kept open for the TiledFrame
+    return (page.shape[0] * page.shape[1] > TILED_PIXELS and page.samplesperpixel == 1 
+            and len(page.dataoffsets) > 1 and page.ndim == 2)
+
+def picture_store(files, mode=None, budget=IMAGE_BUDGET, convert=None, tiled=False):
+    """
+    Creates the list of the images of a directory: an :class:`ImageStore` of its files,
+    or a :class:`TiffStack` if the directory holds a single TIFF file having several pages.
+    
+    :param files: the paths of the image files of the directory, sorted by name
+    :type files: list[str]
+    :param str mode: the mode the images are converted into once decoded, None to keep their own mode
+    :param int budget: the maximum number of bytes of decoded images kept in memory
+    :param convert: the function turning each decoded image into the object kept in memory, None to keep the image
+    :type convert: function
+    :param bool tiled: True if the very large TIFF images are read by tiles
+    :return: the list of the images
+    :rtype: ImageStore
+    """
+    
+    if len(files) == 1 and os.path.splitext(files[0])[1] in ('.tif', '.tiff'):
+        if FILES.read(files[0], lambda file: len(file.pages)) > 1:
+            return TiffStack(files[0], mode, budget, convert)
+    return ImageStore(files, mode, budget, convert, tiled)
+
+def colour_image(img):
+    """
+    Returns a colour copy of an image of the project, on which the followed hyphae can be drawn.
+    The greyscale images are kept in their own mode and only the images shown or exported are converted.
+    
+    :param Image img: the image
+    :return: the copy of the image in RGBA mode
+    :rtype: Image
+    """
+    
+    return img.convert('RGBA')
+
+def image_bytes(img):
+    """
+    Estimates the memory taken by a decoded image.
+    
+    :param img: the image
+    :type img: Image, AI.SkeletonFrame or TiledFrame
+    :return: the number of bytes
+    :rtype: int
+    """
+    
+    if isinstance(img, (AI.SkeletonFrame, TiledFrame)):
+        return img.nbytes
+    return img.width * img.height * len(img.getbands())
 
 
 def new_directory(path): 
@@ -57,11 +539,16 @@ def new_directory(path):
     except IOError:
         return("An error occurred while creating the directory.")
    
-def load_pictures(project): 
+def load_pictures(project, budget=IMAGE_BUDGET, workers=DECODE_WORKERS): 
     """ 
     Loads the images from the directories 'skeletons' and 'regMosaic' given by the project path attribute.
+    Each directory holds either one file per image, or a single multipage TIFF file holding all the images (see :class:`TiffStack`).
+    The images are kept by the :class:`ImageStore` lists of the project: they are decoded in advance by a pool of threads 
+    as long as the budget allows it, the others on first access.
     
     :param Project project: the project giving the path to the images to load
+    :param int budget: the maximum number of bytes of decoded images kept in memory for each list
+    :param int workers: the number of threads decoding the images, 0 to decode them on first access only
     :return: a tuple of a boolean and a string indicating the state of the creation of the project environment
     :rtype: (bool, str)
     :raise FileNotFoundError: if the skeleton or greyscale images directory has not been found
@@ -70,16 +557,15 @@ def load_pictures(project):
     .. codeauthor:: Laura Xénard
     """
     
-    # Filling of 'skelPics' with the skelettonized pictures to display
+    # Listing of the skelettonized pictures to display
     skel_path = os.path.abspath(os.path.join(project.path + '/skeletons'))
+    skelFiles = []
     try:    
         with os.scandir(skel_path) as dirIt:
             for entry in dirIt:
                 # If the item is an image file
                 if entry.is_file() and is_img(entry.path):
-                    img = Image.open(entry.path) # loading of the image (by pillow)
-                    imgName = os.path.basename(entry.path) # name of the image
-                    project.skelPics.append((img, imgName)) # add in the list                         
+                    skelFiles.append((entry.path, os.path.basename(entry.path))) # path and name of the image
     except FileNotFoundError:
         return (False, "ERROR when loading skeletons: "
                      "directory not found.") 
@@ -87,17 +573,15 @@ def load_pictures(project):
         return (False, "ERROR when loading skeletons: "
                 "the specified path does not match a directory.")    
     
-    # Filling of 'grayPics' with the greyscale images to display
+    # Listing of the greyscale images to display
     grey_path = os.path.abspath(os.path.join(project.path + '/regMosaic'))
+    greyFiles = []
     try:    
         with os.scandir(grey_path) as dirIt:
             for entry in dirIt:
                 # If the item is an image file
                 if entry.is_file() and is_img(entry.path):
-                    img = Image.open(entry.path) # loading of the image (by pillow)
-                    img = img.convert('RGBA') 
-                    imgName = os.path.basename(entry.path) # name of the iamge
-                    project.greyPics.append((img, imgName)) # add in the list                          
+                    greyFiles.append((entry.path, os.path.basename(entry.path))) # path and name of the image
     except FileNotFoundError:
         return (False, "ERROR when loading grayscale images: "
                      "directory not found.") 
@@ -106,16 +590,75 @@ def load_pictures(project):
                 "the specified path does not match a directory.")
  
     # Sorting lists to ensure that the images are in chronological order
-    project.skelPics.sort(key = operator.itemgetter(1))
-    project.greyPics.sort(key = operator.itemgetter(1))
+    skelFiles.sort(key = operator.itemgetter(1))
+    greyFiles.sort(key = operator.itemgetter(1))
+    try:
+        # kept with 1 bit per pixel, or read by tiles around the areas searched by the analysis for very large images
+        project.skelPics = picture_store([path for path, name in skelFiles], budget=budget, convert=AI.pack_skeleton, tiled=True)
+    except (OSError, ValueError): # ValueError: tifffile.TiffFileError
+        return (False, "ERROR when loading skeletons: "
+                "the TIFF stack can't be read.")
+    try:
+        project.greyPics = picture_store([path for path, name in greyFiles], budget=budget) # kept in their own mode (see colour_image)
+    except (OSError, ValueError):
+        return (False, "ERROR when loading grayscale images: "
+                "the TIFF stack can't be read.")
     
     # Check of the length of the lists which gave to be the same
     if len(project.skelPics) != len(project.greyPics):
         return (False, "An error occured during the loading of the pictures:"
                 "the number of skeletonized images and grayscale images are not the same")
     
+    if workers > 0:
+        try:
+            project.skelPics.load(workers)
+        except OSError:
+            return (False, "ERROR when loading skeletons: "
+                    "an image can't be read.")
+        try:
+            project.greyPics.load(workers)
+        except OSError:
+            return (False, "ERROR when loading grayscale images: "
+                    "an image can't be read.")
+    
     return(True, "Images successfully loaded.")
             
+def append_pictures(project, settle=WATCH_SETTLE):
+    """
+    Appends to the image lists of a project the images added to its directories 'skeletons' and 'regMosaic' since they were loaded:
+    the image files whose name comes after the name of the last image of the list, in the order of their names, 
+    as long as they haven't been modified for 'settle' seconds (the files being written are kept for later).
+    An image is only appended once it is in both directories. The images of a TIFF stack are not appended.
+    
+    :param Project project: the :class:`Project` whose images have been loaded (see :func:`load_pictures`)
+    :param float settle: the number of seconds without modification after which a file is completely written
+    :return: the number of images appended
+    :rtype: int
+    :raise FileNotFoundError: if the skeleton or greyscale images directory has not been found
+    """
+    
+    if isinstance(project.skelPics, TiffStack) or isinstance(project.greyPics, TiffStack):
+        return 0
+    
+    now = time.time()
+    newFiles = []
+    for directory, store in (('skeletons', project.skelPics), ('regMosaic', project.greyPics)):
+        last = store.names[-1] if len(store) > 0 else ''
+        with os.scandir(os.path.abspath(os.path.join(project.path, directory))) as dirIt:
+            entries = sorted((entry for entry in dirIt if entry.name > last and entry.is_file()), key=operator.attrgetter('name'))
+        files = []
+        for entry in entries:
+            if now - entry.stat().st_mtime < settle:
+                break # being written: the next files wait for it
+            if is_img(entry.path):
+                files.append(entry.path)
+        newFiles.append(files)
+    
+    count = min(len(newFiles[0]), len(newFiles[1]))
+    project.skelPics.extend(newFiles[0][:count])
+    project.greyPics.extend(newFiles[1][:count])
+    return count
+            
 def new_environment(project):
     """
     Creates a new project environment:
@@ -150,7 +693,7 @@ def new_environment(project):
            
 def open_project(path_file):
     """
-    Opens an already saved project.
+    Opens an already saved project: a save written by :func:`write_project`, or a pickled project saved by a previous version.
    
     :param str path_file: the path to the project save
     :return: the :class:`Project` of the module :mod:`Mushroom` extracted from the save and a boolean and a string indicating the state of the creation of the project
@@ -165,24 +708,67 @@ def open_project(path_file):
        with open(path_file,'rb') as file:
            
            try:
-               my_depickler = pickle.Unpickler(file) #reading of the file
-               project = my_depickler.load() #recording in the object
-               loadingOK, message = load_pictures(project) # loading of the images (squelettons et greyscale)
-               if loadingOK:
-                   return (project, True, "Project loaded.")
+               if zipfile.is_zipfile(file):
+                   project = read_project(path_file)
+                   if os.path.exists(path_file + JOURNAL_EXTENSION): # incremental saves
+                       replay_journal(project, path_file)
                else:
+                   file.seek(0)
+                   my_depickler = pickle.Unpickler(file) #reading of the file
+                   project = my_depickler.load() #recording in the object
+                   update_project(project) # saves made by previous versions are brought up to date
+               manifest = read_manifest(project)
+               # loading of the images (squelettons et greyscale), those described by the manifest are only decoded when needed
+               loadingOK, message = load_pictures(project, workers=0 if manifest != None else DECODE_WORKERS)
+               if not loadingOK:
                    return (project, False, message)
+               if manifest != None:
+                   changed = changed_images(project, manifest)
+                   if changed:
+                       if any(name.startswith('skeletons/') for name in changed):
+                           project.offsets = None # the registration has to be computed again
+                       return (project, True, "Project loaded. Images changed since the last save: " + ", ".join(changed))
+               return (project, True, "Project loaded.")
            except pickle.UnpicklingError:
                 return (None, False, "Unpickling failed.")
+           except (zipfile.BadZipFile, KeyError, ValueError) as error:
+                return (None, False, "The save can't be read: {}.".format(error))
         
     except FileNotFoundError:
         return (None, False, "No file has been found at the specified path.")
                
-def save_project(project):
+def update_project(project):
     """
-    Saves the project in a file named by the date thanks to the module :mod:`datetime` without its images.
+    Brings a :class:`Project` unpickled from a save made by a previous version of the application up to date.
+    
+    :param Project project: the unpickled :class:`Project`
+    """
+    
+    if not hasattr(project, 'offsets'):
+        project.offsets = None
+    if not hasattr(project, 'journal'):
+        project.journal = None
+    analysis = project.analysis
+    if not hasattr(project, 'analysisIds'): # the ids were given by counters shared by the whole application
+        project.analysisIds = msh.IdAllocator(analysis.id + 1 if analysis != None else 1)
+    if analysis != None:
+        if not hasattr(analysis, 'segmentIds'):
+            analysis.segmentIds = msh.IdAllocator(max(analysis.segments, default=0) + 1)
+        if not isinstance(analysis.list_pixels, msh.PixelList):
+            analysis.list_pixels = msh.PixelList(analysis.list_pixels)
+        if not hasattr(analysis, 'origins'):
+            analysis.origins = [analysis.startApex]
+            analysis.forests = {0: list(analysis.segments)}
+        if not hasattr(analysis, 'tracker'):
+            analysis.tracker = None
+               
+def save_project(project, incremental=False):
+    """
+    Saves the project in a file named by the date thanks to the module :mod:`datetime` without its images (see :func:`write_project`).
+    An incremental save only appends the changes of the project to the journal of the save :data:`SAVE_NAME` (see :func:`save_journal`).
     
     :param Project project: the :class:`Project` to save
+    :param bool incremental: True for an incremental save, False for a new save
     :return: a message indicating if the saving worked
     :rtype: str
     :raise FileNotFoundError: if the save directory has not been found
@@ -192,30 +778,606 @@ def save_project(project):
     """
     
     result = "Project saved."
-    # copy of the pictures before delete them for the saving
-    skelPicsCopy = project.skelPics.copy() 
-    greyPicsCopy = project.greyPics.copy()
-    
-    # deleting of the pictures for the saving
-    project.skelPics = [] 
-    project.greyPics = []
     
     # put the name of the file in a format yyyy-mm-dd-hh-mm-ss (year,month,day,hour,minute,second)
     myDate = datetime.date.today()
     mytime = datetime.datetime.now()
     projetid = (str(myDate) + '-' + str(mytime.hour) + '-' + str(mytime.minute) + '-' + str(mytime.second))
     
+    journal = project.journal
+    appended = journal == None or journal.pictures != (len(project.skelPics), len(project.greyPics)) # see append_pictures
     try:
-        with open(os.path.abspath(os.path.join(project.path + '/save/ProjectNumber'+ projetid)), 'wb') as file:
-            my_pickler = pickle.Pickler(file)
-            my_pickler.dump(project)
+        if incremental:
+            save_journal(project, os.path.abspath(os.path.join(project.path, 'save', SAVE_NAME)))
+        else:
+            write_project(project, os.path.abspath(os.path.join(project.path + '/save/ProjectNumber'+ projetid)))
     except FileNotFoundError:
         result = "An error occurred during the save. Directory not found."
-
-    project.skelPics = skelPicsCopy.copy()
-    project.greyPics = greyPicsCopy.copy()
     
+    if result == "Project saved." and not (incremental and project.journal.records > 0 and not appended): # the images only change when new ones are appended
+        try:
+            write_manifest(project)
+        except OSError:
+            pass # without manifest, the images are checked by decoding them at the next opening
     return result
+
+def write_project(project, path):
+    """
+    Writes a project without its images in a save file: a ZIP archive holding a JSON description of the project ('project.json')
+    and its heavy sections, the pixels, segments and steps of the analysis stored as NumPy arrays ('.npy') and its images as PNG files.
+    The file is replaced only once completely written.
+    
+    :param Project project: the :class:`Project` to save
+    :param str path: the path of the save file
+    :raise OSError: if the file can't be written
+    """
+    
+    arrays = {}
+    images = {}
+    if project.offsets != None:
+        arrays['offsets'] = _offset_array(project.offsets)
+    analysis = project.analysis
+    if analysis != None:
+        arrays['pixels'] = _pixel_array(analysis.list_pixels)
+        arrays.update(_segment_arrays(analysis.segments.values()))
+        arrays['steps'] = _step_array(analysis.steps.items())
+        images = _analysis_images(analysis, ('finalImg', 'stepImg'))
+    
+    with open(path + '.tmp', 'wb') as file:
+        _write_archive(file, _project_description(project), arrays, images)
+    os.replace(path + '.tmp', path)
+
+def _project_description(project):
+    """
+    Returns the JSON description of a project and of its analysis written in a save.
+    """
+    
+    description = {'format': SAVE_FORMAT, 'version': SAVE_VERSION, 
+                   'id': project.id, 'path': project.path, 'currentImg': project.currentImg, 
+                   'previousImgDisplayed': project.previousImgDisplayed, 'notes': project.notes, 
+                   'analysisIds': project.analysisIds.nextId, 'analysis': None}
+    analysis = project.analysis
+    if analysis != None:
+        description['analysis'] = {'id': analysis.id, 'startApex': _point(analysis.startApex), 
+                                   'origins': [_point(origin) for origin in analysis.origins], 
+                                   'startImg': analysis.startImg, 'endImg': analysis.endImg, 
+                                   'currentStep': analysis.currentStep, 'previousStepDisplayed': analysis.previousStepDisplayed, 
+                                   'hyphae': analysis.hyphae, 'forests': analysis.forests, 
+                                   'processing_time': analysis.processing_time, 'segmentIds': analysis.segmentIds.nextId,
+                                   'stepImg': 'finalImg' if analysis.stepImg is analysis.finalImg else 'stepImg',
+                                   'tracker': _tracker_description(analysis.tracker)}
+    return description
+
+def _tracker_description(state):
+    """
+    Returns the JSON description of the state of the tracking of an analysis (see :class:`TrackerState`), None if there is none.
+    """
+    
+    if state == None:
+        return None
+    segment = state.segment
+    return {'origin': state.origin, 'known': state.known, 'num_picture': state.num_picture, 
+            'coord': _point(state.coord), 'previous': _point(state.previous), 'check': state.check,
+            'nodes': [[image, _point(coord), previous] for image, coord, previous in state.nodes], 'frontier': state.frontier,
+            'segment': None if segment == None else {'id': segment.id, 'previous': segment.previous, 'deadEnd': segment.deadEnd, 'size': segment.size,
+                                                     'coord': [_point(coord) for coord in segment.coord],
+                                                     'evolution': [[image, _point(coord), length] for image, (coord, length) in segment.evolution.items()]}}
+
+def _write_archive(file, description, arrays, images):
+    """
+    Writes a ZIP archive of a save (see :func:`write_project`) in an open file.
+    """
+    
+    with zipfile.ZipFile(file, 'w') as archive:
+        archive.writestr('project.json', json.dumps(description), zipfile.ZIP_DEFLATED)
+        for name, array in arrays.items():
+            data = io.BytesIO()
+            np.save(data, array, allow_pickle=False)
+            archive.writestr(name + '.npy', data.getvalue(), zipfile.ZIP_DEFLATED)
+        for name, data in images.items():
+            archive.writestr(name + '.png', data) # already compressed
+
+def _offset_array(offsets):
+    return np.array([(offset.x, offset.y) for offset in offsets], dtype=np.int32).reshape(-1, 2)
+
+def _pixel_array(pixels):
+    return np.array([(pixel.x, pixel.y) for pixel in pixels], dtype=np.int32).reshape(-1, 2)
+
+def _step_array(steps):
+    """
+    Converts steps of an analysis into an array of a save: the step index, the coordinates of the apex and the index of the image of each step.
+    """
+    
+    return np.array([(step,) + tuple(_point(coord) or (np.nan, np.nan)) + (np.nan if image == None else image,) 
+                     for step, (coord, image) in steps], dtype=np.float64).reshape(-1, 4)
+
+def _segment_arrays(segments):
+    """
+    Converts segments of an analysis into the arrays of a save:
+    
+        * 'segments': id, previous id, dead end (0 or 1), size, number of coordinates and number of evolution steps of each segment
+        * 'coords': the coordinates of the segments, one after the other
+        * 'evolution': the image, coordinates and length of the evolution steps of the segments, one after the other
+    """
+    
+    table, coords, evolution = [], [], []
+    for segment in segments:
+        table.append((segment.id, segment.previous, segment.deadEnd, segment.size, len(segment.coord), len(segment.evolution)))
+        coords.extend(_point(coord) or (np.nan, np.nan) for coord in segment.coord)
+        evolution.extend((image,) + tuple(_point(coord) or (np.nan, np.nan)) + (np.nan if isinstance(length, str) else length,) # "n" of "No analysis"
+                         for image, (coord, length) in segment.evolution.items())
+    return {'segments': np.array(table, dtype=np.int64).reshape(-1, 6),
+            'coords': np.array(coords, dtype=np.float64).reshape(-1, 2),
+            'evolution': np.array(evolution, dtype=np.float64).reshape(-1, 4)}
+
+def _analysis_images(analysis, names):
+    """
+    Returns the PNG files of the given images of an analysis written in a save, the step image being left out when it is the final image.
+    """
+    
+    images = {}
+    for name in names:
+        img = getattr(analysis, name)
+        if img != None and not (name == 'stepImg' and img is analysis.finalImg):
+            data = io.BytesIO()
+            img.save(data, 'PNG')
+            images[name] = data.getvalue()
+    return images
+
+def read_project(path):
+    """
+    Reads a project written by :func:`write_project`, without its images. 
+    The pixels, segments and images of the analysis are only read when first used (see :class:`SaveSections`).
+    
+    :param str path: the path of the save file
+    :return: the :class:`Project`
+    :rtype: Project
+    :raise OSError: if the file can't be read
+    :raise ValueError: if the file isn't a save, or has been written by a newer version of the application
+    """
+    
+    with zipfile.ZipFile(path) as archive:
+        description = json.loads(archive.read('project.json'))
+        names = set(archive.namelist())
+        offsets = _read_array(archive, 'offsets') if 'offsets.npy' in names else None
+        steps = _read_array(archive, 'steps') if 'steps.npy' in names else None
+    
+    project = msh.Project(description.get('path'), description.get('id'))
+    _apply_description(project, description)
+    if offsets is not None:
+        project.offsets = [msh.Coordinates(x, y) for x, y in offsets.tolist()]
+    if project.analysis != None:
+        project.analysis.steps = _read_steps(steps)
+        project.analysis._sections = SaveSections(path, {'list_pixels', 'segments', 'finalImg', 'stepImg'}, description['analysis']['stepImg'])
+    return project
+
+def _apply_description(project, description):
+    """
+    Updates a project and its analysis with the JSON description of a save (see :func:`_project_description`).
+    A new :class:`Analysis` is created without its heavy attributes if the description is the one of another analysis.
+    
+    :raise ValueError: if the description isn't the one of a save, or has been written by a newer version of the application
+    """
+    
+    if description.get('format') != SAVE_FORMAT:
+        raise ValueError("not a save of the application")
+    if description['version'] > SAVE_VERSION:
+        raise ValueError("save written by a newer version of the application")
+    
+    project.currentImg = description['currentImg']
+    project.previousImgDisplayed = description['previousImgDisplayed']
+    project.notes = description['notes']
+    project.analysisIds = msh.IdAllocator(description['analysisIds'])
+    
+    saved = description['analysis']
+    if saved == None:
+        project.analysis = None
+        return
+    analysis = project.analysis
+    if analysis == None or analysis.id != saved['id']:
+        analysis = msh.Analysis.__new__(msh.Analysis) # the heavy attributes are left out, to be read when first used
+        project.analysis = analysis
+    analysis.id = saved['id']
+    analysis.startApex = _coordinates(*saved['startApex'])
+    analysis.origins = [_coordinates(x, y) for x, y in saved['origins']]
+    analysis.startImg = saved['startImg']
+    analysis.endImg = saved['endImg']
+    analysis.currentStep = saved['currentStep']
+    analysis.previousStepDisplayed = saved['previousStepDisplayed']
+    analysis.hyphae = saved['hyphae']
+    analysis.forests = {int(iOrigin): segments for iOrigin, segments in saved['forests'].items()}
+    analysis.processing_time = saved['processing_time']
+    analysis.segmentIds = msh.IdAllocator(saved['segmentIds'])
+    analysis.tracker = _read_tracker(saved.get('tracker'))
+
+def _read_tracker(saved):
+    """
+    Returns the state of the tracking of an analysis from its JSON description (see :func:`_tracker_description`), None if there is none.
+    """
+    
+    if saved == None:
+        return None
+    state = msh.TrackerState(saved['origin'], saved['known'])
+    state.num_picture = saved['num_picture']
+    state.coord = _coordinates(*saved['coord'] or (None, None))
+    state.previous = _coordinates(*saved['previous'] or (None, None))
+    state.check = saved['check']
+    state.nodes = [[image, _coordinates(*coord), previous] for image, coord, previous in saved['nodes']]
+    state.frontier = saved.get('frontier')
+    segment = saved['segment']
+    if segment != None:
+        state.segment = msh.HyphaSegment(segment['id'], segment['previous'], None)
+        state.segment.deadEnd = segment['deadEnd']
+        state.segment.size = segment['size']
+        state.segment.coord = [_coordinates(*coord or (None, None)) for coord in segment['coord']]
+        state.segment.evolution = {image: [_coordinates(*coord or (None, None)), length] for image, coord, length in segment['evolution']}
+    return state
+
+def _read_steps(steps):
+    return {int(step): [_coordinates(x, y), None if np.isnan(image) else int(image)] for step, x, y, image in steps.tolist()}
+
+def save_journal(project, path):
+    """
+    Saves a project incrementally: only what has changed since the previous save of the project (the new pixels, the new or modified segments and steps)
+    is appended as a record to the journal of the save, the file 'path' followed by :data:`JOURNAL_EXTENSION`.
+    The journal is compacted into the save (see :func:`write_project`) every :data:`JOURNAL_RECORDS` records, 
+    and when the project has not been saved in this file yet or its analysis has been replaced.
+    Each record is an archive of the same format as the save, preceded by its size in bytes (8 bytes, little-endian).
+    
+    :param Project project: the :class:`Project` to save
+    :param str path: the path of the save file
+    :raise OSError: if the file can't be written
+    """
+    
+    journal = project.journal
+    if journal == None or journal.path != path or journal.records >= JOURNAL_RECORDS or not journal.follows(project):
+        write_project(project, path)
+        if os.path.exists(path + JOURNAL_EXTENSION):
+            os.remove(path + JOURNAL_EXTENSION)
+        project.journal = SaveJournal(path, project)
+        return
+    
+    record = journal.record(project)
+    with open(path + JOURNAL_EXTENSION, 'ab') as file:
+        file.write(len(record).to_bytes(8, 'little') + record)
+        file.flush()
+        os.fsync(file.fileno())
+    journal.records += 1
+
+def replay_journal(project, path):
+    """
+    Applies to a project read from a save the records of the journal of the save (see :func:`save_journal`).
+    The records written for a previous version of the save and a last record cut by an interruption are ignored.
+    
+    :param Project project: the :class:`Project` read from the save file
+    :param str path: the path of the save file
+    :return: the number of records applied
+    :rtype: int
+    :raise OSError: if the journal can't be read
+    """
+    
+    with zipfile.ZipFile(path) as archive:
+        generation = archive.read('journal').decode() if 'journal' in archive.namelist() else None
+    count = 0
+    with open(path + JOURNAL_EXTENSION, 'rb') as file:
+        while True:
+            size = int.from_bytes(file.read(8), 'little')
+            record = file.read(size)
+            if size == 0 or len(record) < size:
+                break
+            with zipfile.ZipFile(io.BytesIO(record)) as archive:
+                description = json.loads(archive.read('project.json'))
+                if description.get('journal') != generation:
+                    continue
+                _apply_record(project, description, archive)
+            count += 1
+    return count
+
+def _apply_record(project, description, archive):
+    """
+    Applies a record of a journal (see :meth:`SaveJournal.record`) to a project.
+    """
+    
+    _apply_description(project, description)
+    names = set(archive.namelist())
+    if 'offsets' in description: # computed again since the previous record
+        project.offsets = [msh.Coordinates(x, y) for x, y in _read_array(archive, 'offsets').tolist()] if description['offsets'] else None
+    analysis = project.analysis
+    if analysis == None:
+        return
+    
+    pixels = analysis.list_pixels
+    del pixels[description['pixelsFrom']:]
+    pixels.extend(msh.Coordinates(x, y) for x, y in _read_array(archive, 'pixels').tolist())
+    analysis.segments.update(_read_segments(*(_read_array(archive, array) for array in ('segments', 'coords', 'evolution'))))
+    analysis.steps.update(_read_steps(_read_array(archive, 'steps')))
+    for name in description['images']:
+        if name == 'stepImg' and description['analysis']['stepImg'] == 'finalImg':
+            analysis.stepImg = analysis.finalImg
+        elif name + '.png' in names:
+            with archive.open(name + '.png') as file:
+                img = Image.open(io.BytesIO(file.read()))
+                img.load()
+            setattr(analysis, name, img)
+        else:
+            setattr(analysis, name, None)
+
+
+class SaveJournal:
+    """
+    Class keeping what has been written of a project in a save and its journal, so that the next incremental save only appends the changes (see :func:`save_journal`).
+    
+    :param str path: the path of the save file
+    :param int records: the number of records in the journal
+    :param str generation: the mark of the save (its file 'journal') written to the records of its journal
+    :param Analysis analysis: the analysis saved
+    :param pictures: the number of skeleton and greyscale images of the project saved
+    :type pictures: (int, int)
+    """
+    
+    def __init__(self, path, project):
+        """
+        Class constructor, once the project has been written in the save.
+        """
+        
+        self.path = path
+        self.records = 0
+        self.generation = datetime.datetime.now().isoformat()
+        self.analysis = project.analysis
+        self._remember(project)
+        with zipfile.ZipFile(path, 'a') as archive: # the records of a previous version of the save can't be mistaken for those of this one
+            archive.writestr('journal', self.generation)
+        
+    def follows(self, project):
+        """
+        Checks that the changes of a project since the last save can be recorded: its analysis is the same, and nothing has been removed from it.
+        
+        :param Project project: the :class:`Project`
+        :return: True if the changes can be recorded, False if the project has to be saved again
+        :rtype: bool
+        """
+        
+        analysis = project.analysis
+        if analysis is not self.analysis:
+            return False
+        if analysis == None:
+            return True
+        return all(id in analysis.segments for id in self._segments) and all(step in analysis.steps for step in self._steps)
+    
+    def record(self, project):
+        """
+        Returns the record of the changes of a project since the last save.
+        
+        :param Project project: the :class:`Project`
+        :return: the archive of the changes
+        :rtype: bytes
+        """
+        
+        description = _project_description(project)
+        description['journal'] = self.generation
+        arrays = {}
+        if project.offsets is not self._offsets:
+            description['offsets'] = project.offsets != None
+            if project.offsets != None:
+                arrays['offsets'] = _offset_array(project.offsets)
+        analysis = project.analysis
+        if analysis != None:
+            pixels = analysis.list_pixels
+            saved, count = self._pixels
+            start = count if pixels is saved and count <= len(pixels) else 0 # otherwise the pixels are written again
+            if pixels.modified != None: # pixels replaced by the tracking (see AI.shift_correction)
+                start = min(start, pixels.modified)
+            description['pixelsFrom'] = start
+            arrays['pixels'] = _pixel_array(itertools.islice(pixels, start, None))
+            arrays.update(_segment_arrays(segment for id, segment in analysis.segments.items() if self._segments.get(id) != _segment_mark(segment)))
+            arrays['steps'] = _step_array((step, value) for step, value in analysis.steps.items() if self._steps.get(step) != repr(value))
+            description['images'] = [name for name in ('finalImg', 'stepImg') if self._images[name] is not getattr(analysis, name)]
+            images = _analysis_images(analysis, description['images'])
+        else:
+            images = {}
+        
+        data = io.BytesIO()
+        _write_archive(data, description, arrays, images)
+        self._remember(project)
+        return data.getvalue()
+    
+    def _remember(self, project):
+        """
+        Keeps what has been saved of a project.
+        """
+        
+        self._offsets = project.offsets
+        self.pictures = (len(project.skelPics), len(project.greyPics))
+        analysis = project.analysis
+        if analysis != None:
+            pixels = analysis.list_pixels
+            self._pixels = (pixels, len(pixels))
+            pixels.modified = None
+            self._segments = {id: _segment_mark(segment) for id, segment in analysis.segments.items()}
+            self._steps = {step: repr(value) for step, value in analysis.steps.items()}
+            self._images = {'finalImg': analysis.finalImg, 'stepImg': analysis.stepImg}
+
+def _segment_mark(segment):
+    """
+    Returns the values telling if a segment has changed since it was saved: its last coordinates and evolution step are the only ones which change.
+    """
+    
+    evolution = next(reversed(segment.evolution.items()), None)
+    return (segment.previous, segment.deadEnd, segment.size, len(segment.coord), repr(segment.coord[-1]), len(segment.evolution), repr(evolution))
+
+def _read_array(archive, name):
+    with archive.open(name + '.npy') as file:
+        return np.load(io.BytesIO(file.read()), allow_pickle=False)
+
+
+class SaveSections:
+    """
+    Class reading the heavy sections of an :class:`Analysis` from its save file (see :func:`read_project`) when they are first used.
+    
+    :param str path: the path of the save file
+    :param names: the names of the attributes of the analysis read from the file
+    :type names: set[str]
+    :param str stepImg: 'finalImg' if the step image of the analysis is its final image, 'stepImg' otherwise
+    """
+    
+    def __init__(self, path, names, stepImg='stepImg'):
+        """
+        Class constructor.
+        """
+        
+        self.path = path
+        self.names = names
+        self._stepImg = stepImg
+        
+    def load(self, analysis, name):
+        """
+        Reads an attribute of the analysis from the save file.
+        
+        :param Analysis analysis: the analysis
+        :param str name: the name of the attribute
+        :return: the value of the attribute
+        :raise OSError: if the file can't be read
+        """
+        
+        with zipfile.ZipFile(self.path) as archive:
+            names = set(archive.namelist())
+            if name == 'list_pixels':
+                return msh.PixelList(msh.Coordinates(x, y) for x, y in _read_array(archive, 'pixels').tolist())
+            elif name == 'segments':
+                return _read_segments(*(_read_array(archive, array) for array in ('segments', 'coords', 'evolution')))
+            elif name == 'stepImg' and self._stepImg == 'finalImg':
+                return analysis.finalImg
+            elif name + '.png' in names:
+                with archive.open(name + '.png') as file:
+                    img = Image.open(io.BytesIO(file.read()))
+                    img.load()
+                    return img
+            return None
+
+def _read_segments(table, coords, evolution):
+    """
+    Converts the arrays of a save back into the segments of an analysis (see :func:`_segment_arrays`).
+    """
+    
+    segments = {}
+    iCoord, iEvolution = 0, 0
+    coords, evolution = coords.tolist(), evolution.tolist()
+    for id, previous, deadEnd, size, nCoords, nEvolution in table.tolist():
+        segment = msh.HyphaSegment(id, previous, None)
+        segment.deadEnd = bool(deadEnd)
+        segment.size = size
+        segment.coord = [_coordinates(x, y) for x, y in coords[iCoord:iCoord+nCoords]]
+        segment.evolution = {int(image): [_coordinates(x, y), None if np.isnan(length) else int(length)] 
+                             for image, x, y, length in evolution[iEvolution:iEvolution+nEvolution]}
+        iCoord += nCoords
+        iEvolution += nEvolution
+        segments[id] = segment
+    return segments
+
+def _point(coord):
+    """
+    Returns the coordinates of a point of a save, None if there is no point.
+    """
+    
+    if not isinstance(coord, msh.Coordinates): # None, or a letter of "No analysis" kept by the tracking as the end of an artefact
+        return None
+    return [_number(coord.x), _number(coord.y)]
+
+def _number(value):
+    value = float(value)
+    return int(value) if value.is_integer() else value
+
+def _coordinates(x, y):
+    """
+    Returns the :class:`Coordinates` of a point of a save, None if there is no point.
+    """
+    
+    if x == None or np.isnan(x):
+        return None
+    return msh.Coordinates(_number(x), _number(y))
+
+def write_manifest(project):
+    """
+    Saves in the 'save' directory of the project the manifest of its images: the name, size, modification time, dimensions and hash of each file.
+    The files unchanged since the previous manifest are not read again.
+    
+    :param Project project: the :class:`Project` whose images are described
+    :raise OSError: if a file can't be read or the manifest can't be written
+    """
+    
+    previous = read_manifest(project) or {}
+    manifest = {}
+    for directory, store in (('skeletons', project.skelPics), ('regMosaic', project.greyPics)):
+        for path in sorted(set(getattr(store, 'paths', []))): # a TIFF stack is a single file
+            name = directory + '/' + os.path.basename(path)
+            stat = os.stat(path)
+            record = previous.get(name)
+            if record == None or record['size'] != stat.st_size or record['mtime'] != stat.st_mtime_ns:
+                with Image.open(path) as img: # only the header is read
+                    width, height = img.size
+                record = {'size': stat.st_size, 'mtime': stat.st_mtime_ns, 'width': width, 'height': height, 'hash': file_hash(path)}
+            manifest[name] = record
+    
+    with open(os.path.join(project.path, 'save', MANIFEST_NAME), 'w') as file:
+        json.dump(manifest, file, indent=1)
+
+def read_manifest(project):
+    """
+    Reads the manifest of the images of a project (see :func:`write_manifest`).
+    
+    :param Project project: the :class:`Project` whose images are described
+    :return: the description of each image, by 'directory/name', or None if there is no manifest
+    :rtype: dict{str : dict}
+    """
+    
+    try:
+        with open(os.path.join(project.path, 'save', MANIFEST_NAME)) as file:
+            return json.load(file)
+    except (OSError, ValueError):
+        return None
+
+def changed_images(project, manifest):
+    """
+    Lists the images of a project that have been added, removed or modified since its manifest was written.
+    The files whose size and modification time are unchanged are trusted, the others are compared by their hash.
+    
+    :param Project project: the :class:`Project` whose images are checked
+    :param manifest: the manifest of the images (see :func:`read_manifest`)
+    :type manifest: dict{str : dict}
+    :return: the 'directory/name' of the changed images, sorted
+    :rtype: list[str]
+    """
+    
+    changed = []
+    found = set()
+    for directory, store in (('skeletons', project.skelPics), ('regMosaic', project.greyPics)):
+        for path in sorted(set(store.paths)): # a TIFF stack is a single file
+            name = directory + '/' + os.path.basename(path)
+            found.add(name)
+            record = manifest.get(name)
+            stat = os.stat(path)
+            if record == None:
+                changed.append(name)
+            elif record['size'] != stat.st_size or record['mtime'] != stat.st_mtime_ns:
+                if record['size'] != stat.st_size or record['hash'] != file_hash(path):
+                    changed.append(name)
+    changed.extend(name for name in manifest if name not in found) # removed images
+    return sorted(changed)
+
+def file_hash(path):
+    """
+    Computes the hash of the content of a file.
+    
+    :param str path: the path of the file
+    :return: the SHA-256 hash in hexadecimal
+    :rtype: str
+    """
+    
+    digest = hashlib.sha256()
+    with open(path, 'rb') as file:
+        for block in iter(lambda: file.read(1024*1024), b''):
+            digest.update(block)
+    return digest.hexdigest()
                 
 def export_project(project, txtOk, imgOk, imgstepsOk):
     """
@@ -260,6 +1422,8 @@ def export_project(project, txtOk, imgOk, imgstepsOk):
                     file.write("Image de debut : " + str(project.greyPics[project.analysis.startImg][1]) + " (n. " + str(project.analysis.startImg + 1) + ")\n")
                     file.write("Image de fin : " + str(project.greyPics[project.analysis.endImg][1]) + " (n. " + str(project.analysis.endImg + 1) + ")\n")
                     file.write("Coordonnees de l'apex selectionne : " + str(project.analysis.startApex) + "\n")
+                    if len(project.analysis.origins) > 1:
+                        file.write("Nombre d'apex suivis : " + str(len(project.analysis.origins)) + "\n")
                     
                     if project.notes != "":
                         file.write("Commentaires : " + str(project.notes) + "\n")
@@ -291,6 +1455,14 @@ def export_project(project, txtOk, imgOk, imgstepsOk):
                             evo = project.analysis.segments[key].evolution                            
                             file.write("{:>10} |{:>20} |{:>20} | {:>8} | {}\n".format(key, str(coord[0]), str(coord[1]), size, evo))
                             i += 1
+                    
+                    if len(project.analysis.origins) > 1: # the segments found from each followed apex
+                        file.write("\n")
+                        file.write("* * Tableau des apex suivis * *")
+                        file.write("\n")
+                        file.write("N. apex |  Coordonnees apex   | Segments\n")
+                        for iOrigin, segments in sorted(project.analysis.forests.items()):
+                            file.write("{:>7} |{:>20} | {}\n".format(iOrigin + 1, str(project.analysis.origins[iOrigin]), ", ".join(str(seg) for seg in segments)))
                             
                     file.close()
             
@@ -298,6 +1470,7 @@ def export_project(project, txtOk, imgOk, imgstepsOk):
                 project.analysis.finalImg.save(export_img_path) # save of the analysis image
             
             if (imgstepsOk == True):
+                import tifffile as tiff
                 with tiff.TiffWriter(export_steps_path) as stack:
                     export_steps(project, stack)
 
@@ -352,7 +1525,7 @@ def export_steps(project, stack, radius=7, color='red'):
             if isinstance(apexCoord, msh.Coordinates):
                 indexImg = value[1]-1 # index of the greyscale image for the step
                 img = project.greyPics[indexImg][0]
-                imgColor = img.copy() # copying the img so as to preserve the original img
+                imgColor = colour_image(img) # copying the img so as to preserve the original img
             
                 # Drawing a circle on the apex
                 draw = ImageDraw.Draw(imgColor)
@@ -48,6 +48,7 @@
  
 
 import sys
+import time
 
 from PyQt5.QtWidgets import (QDialog, QApplication, QMainWindow, QProgressBar, QStatusBar, 
                              QFileDialog, QLabel, QScrollArea, QInputDialog, QMessageBox, QLineEdit)
@@ -216,9 +217,10 @@ class MainWindow(QMainWindow):
         self.mouseCoordinates = QLabel()
         self.statusBar.addWidget(self.mouseCoordinates, 0)
         
-        # Connecting the progressBar to the function confirm that will update the Value
-        self.myLongTask = TaskBar()
-        self.myLongTask.taskFinished.connect(self.confirm)
+        # Connecting the thread running the analysis to the progressBar and to the function displaying the result
+        self.myLongTask = TaskBar(self.manage)
+        self.myLongTask.progressChanged.connect(self.showProgress)
+        self.myLongTask.taskFinished.connect(self.analysisFinished)
         
     ## Project methods ## 
        
@@ -388,6 +390,8 @@ class MainWindow(QMainWindow):
 
         current = self.manage.project.currentImg # Get the current image from Management.
         image = self.manage.project.greyPics[current][0] # Displays the current image. 
+        if image.mode not in ('1', 'L', 'P', 'RGB', 'RGBA'): # The images are kept in their own mode, only the displayed one is converted if Qt can't show it.
+            image = image.convert('RGBA')
         qimg = ImageQt.ImageQt(image)
         self.pixmap = QPixmap.fromImage(qimg)
         self.numberImg.setText(str(self.manage.project.currentImg+1))
@@ -445,6 +449,9 @@ class MainWindow(QMainWindow):
         .. codeauthor:: Bouthayna Haltout
         """
         
+        if self.myLongTask.isRunning(): # The project is read by the thread of the analysis.
+            QMessageBox.warning(self, "Warning", "An analysis is already running.", QMessageBox.Ok)
+            return
         self.manage.clear()
         self.apexS = True # We set apexS to true as a condition 
         selectApex = QMessageBox.question(self, 'Apex Selection', "You can select an apex on this image, would you like to continue?", QMessageBox.Yes, QMessageBox.No)
@@ -491,20 +498,42 @@ class MainWindow(QMainWindow):
         confirm = QMessageBox.question(self,'',
                                        "You have selected the apex of coordinates {} from the image {} and have selected as an end image: {}. Click yes to run the analysis.".format(self.manage.project.analysis.startApex,
                                         self.manage.project.analysis.startImg+1, self.manage.project.analysis.endImg+1 ), QMessageBox.Yes, QMessageBox.No)          
-        if confirm == QMessageBox.Yes:
+        if confirm == QMessageBox.Yes and self.myLongTask.isRunning():
+            QMessageBox.warning(self, "Warning", "An analysis is already running.", QMessageBox.Ok)
+        elif confirm == QMessageBox.Yes:
             self.apexS = False
             self.statusMessage.setText("Analysing...")
-            self.progressBar.setValue(50)
-            message, boolean = self.manage.run()             
-            self.totalNumberOfStep.setText(" / {}".format(len(self.manage.project.analysis.steps)))
-            if boolean == True :  
-                self.progressBar.setValue(100) # The progress bar is at the max when the analysis is done.         
-                self.statusMessage.setText(message)
-                self.displayImgRed()
-            else :
-                QMessageBox.information(self," ",message, QMessageBox.Ok)
-                self.apexS = False
-                self.progressBar.setValue(0)  
+            self.progressBar.setValue(0)
+            self.myLongTask.start() # The analysis runs in its own thread, the window stays responsive.
+            
+    def showProgress(self, value, remaining):
+        """
+        Shows the progress of the running analysis and the estimated remaining time.
+        
+        :param int value: the progress of the analysis in percent
+        :param str remaining: the estimated remaining time
+        """
+        
+        self.progressBar.setValue(value)
+        self.statusMessage.setText("Analysing... {}".format(remaining))
+        
+    def analysisFinished(self, message, boolean):
+        """
+        Displays the result of the analysis once its thread is over.
+        
+        :param str message: the message indicating the state of the analysis
+        :param bool boolean: True if the analysis is done, False otherwise
+        """
+        
+        self.totalNumberOfStep.setText(" / {}".format(len(self.manage.project.analysis.steps)))
+        if boolean == True :  
+            self.progressBar.setValue(100) # The progress bar is at the max when the analysis is done.         
+            self.statusMessage.setText(message)
+            self.displayImgRed()
+        else :
+            QMessageBox.information(self," ",message, QMessageBox.Ok)
+            self.apexS = False
+            self.progressBar.setValue(0)  
         
     ## Post-analysis methods ##
     
@@ -642,19 +671,40 @@ class MainWindow(QMainWindow):
 
 class TaskBar(QThread):
     """
-    Thread class allowing the pyqt signal between the progress bar and the end of the analysis. 
+    Thread class running the analysis of the :mod:`Management` module, so that the window stays responsive.
+    It signals the progress of the analysis image after image, and its end.
+    
+    :param Mana manage: the object managing the project
    
     .. codeauthor:: Bouthayna Haltout   
     """
     
-    taskFinished = pyqtSignal()# We declare taskFinished as a Signal.
+    progressChanged = pyqtSignal(int, str) # progress in percent, estimated remaining time
+    taskFinished = pyqtSignal(str, bool) # message and state of the analysis
+    
+    def __init__(self, manage):
+        super().__init__()
+        self.manage = manage
     
     def run(self):
         """
-        Emits a signal as soon as it's called.
+        Runs the analysis and emits its progress each time it changes, then the result.
+        The result is also emitted if the analysis fails, so that the window doesn't wait for it.
         """      
         
-        self.taskFinished.emit() 
+        start = time.perf_counter()
+        value = 0
+        try:
+            for event, progress in self.manage.run_events():
+                if int(progress*100) > value:
+                    value = int(progress*100)
+                    elapsed = time.perf_counter() - start
+                    remaining = elapsed * (1-progress) / progress
+                    self.progressChanged.emit(value, "about {} s left".format(int(remaining)+1))
+        except Exception as error:
+            self.taskFinished.emit("ERROR during the analysis: {}".format(error), False)
+            return
+        self.taskFinished.emit(*event.data) 
 
 
 if __name__ == '__main__':
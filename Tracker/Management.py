@@ -32,11 +32,20 @@
 """
 
 
+import time
+
 from PIL import ImageDraw
 
 import Mushroom as msh
 import InOut
 import AI
+import Graph
+
+
+ENGINES = {"pixel": AI.picture_analyze, # the hyphae are followed pixel by pixel
+           "graph": Graph.graph_analyze} # the hyphae are followed along the edges of the graph of each skeleton
+WATCH_INTERVAL = 60 # seconds between two looks for new images in watch mode (see Mana.watch_events)
+CHECKPOINT_STEPS = 200 # number of images reached or nodes gone back to between two checkpoints of an analysis run to be resumed (see Mana.run_events)
 
 
 class Mana:
@@ -44,11 +53,19 @@ class Mana:
     Class managing the calls to all the functionnalities of the application.
         
     :param Project project: the project created by the user
+    :param IdAllocator projectIds: the allocator of the ids of the projects created or opened
         
     .. codeauthor:: Sébastien Maillos
     .. codeauthor:: Laura Xénard
     """    
     
+    def __init__(self):
+        """
+        Class constructor.
+        """
+        
+        self.projectIds = msh.IdAllocator(0)
+    
     ## Project management methods ##
     
     def new_project(self, path):
@@ -63,7 +80,7 @@ class Mana:
         .. codeauthor:: Laura Xénard
         """
         
-        self.project = msh.Project(path) # updates the 'project' attribute of 'Management'
+        self.project = msh.Project(path, self.projectIds.allocate()) # updates the 'project' attribute of 'Management'
         return InOut.new_environment(self.project)
                               
     def load_project(self, path):
@@ -81,10 +98,11 @@ class Mana:
         self.project = project # the object 'project'
         return (loadingOK, message)
             
-    def save_project(self):
+    def save_project(self, incremental=False):
         """ 
         Asks InOut to save the current :class:`Project`.
         
+        :param bool incremental: True to append the changes since the previous save to its journal, False for a new save file
         :return: a string indicating the success or failure of the saving
         :rtype: str
         :raise AttributeError: if no :class:`Project` instance exists
@@ -93,7 +111,7 @@ class Mana:
         """
         
         try:
-            message = InOut.save_project(self.project)
+            message = InOut.save_project(self.project, incremental)
         except AttributeError:
             message = "Please create or open a project before trying to save it."
         return message
@@ -166,7 +184,25 @@ class Mana:
             
         self.project.previousImgDisplayed = self.project.currentImg # update of the lastly displayed image
         self.project.currentImg = index # update of the currently displayed image               
+        self._prefetch([(index + self._direction(index, self.project.previousImgDisplayed, len(self.project.greyPics)) * i) % len(self.project.greyPics) 
+                        for i in range(1, AI.PREFETCH_FRAMES+1)])
         return 0
+    
+    def _direction(self, index, previous, count):
+        """
+        Returns -1 if the display goes back from the index 'previous' to the index 'index' (among 'count' indices), 1 otherwise.
+        """
+        
+        return -1 if index == (previous-1) % count else 1
+    
+    def _prefetch(self, indices):
+        """
+        Asks for the decoding in advance of the greyscale images about to be displayed (see :meth:`InOut.ImageStore.prefetch`).
+        """
+        
+        prefetch = getattr(self.project.greyPics, 'prefetch', None)
+        if prefetch != None:
+            prefetch(indices)
 
     
     def greyImgNotDisplayed(self):
@@ -187,7 +223,7 @@ class Mana:
         img = self.project.skelPics[self.project.currentImg]
         isApex, apexRealCoord = AI.is_apex(img, coordSelection)
         if isApex:
-            self.project.analysis = msh.Analysis(apexRealCoord, self.project.currentImg) # creation of an object 'Analysis'
+            self.project.analysis = msh.Analysis(apexRealCoord, self.project.currentImg, self.project.analysisIds.allocate()) # creation of an object 'Analysis'
             # the image from which the apex is selected is imperatively the start image of the analysis
             return (isApex, apexRealCoord)
         else:
@@ -204,9 +240,26 @@ class Mana:
         .. codeauthor:: Laura Xénard
         """
         
-        self.project.analysis = msh.Analysis(apexRealCoord, self.project.currentImg) # creation of an object 'Analysis' isApex
+        self.project.analysis = msh.Analysis(apexRealCoord, self.project.currentImg, self.project.analysisIds.allocate()) # creation of an object 'Analysis' isApex
         return "The apex and start image for the analysis have been updated."
     
+    def select_all_apexes(self):
+        """ 
+        Updates the :class:`Analysis` so that all the apexes of the current image are followed in a single analysis.
+        The current image becomes the start image of the analysis.
+        
+        :return: True if at least one apex has been found, False otherwise, and a message indicating the number of apexes selected
+        :rtype: (bool, str)
+        """
+        
+        img = self.project.skelPics[self.project.currentImg]
+        apexes = AI.find_endpoints(img)
+        if not apexes:
+            return (False, "No apex has been found on this image.")
+        self.project.analysis = msh.Analysis(apexes[0], self.project.currentImg, self.project.analysisIds.allocate())
+        self.project.analysis.origins = apexes
+        return (True, "{} apexes have been selected for the analysis.".format(len(apexes)))
+    
     def select_endImg(self, endImg):
         """
         Updates the :class:`Analysis` with the end image of the analysis.
@@ -222,21 +275,165 @@ class Mana:
         
     ## Analysis methods ##
 
-    def run(self):
+    def register(self):
+        """
+        Computes the drift between each pair of consecutive skeleton images of the :class:`Project`, if it has not been done yet.
+        The drifts are kept in the project (and saved with it). Only the drifts of the images appended since are computed.
+        """
+        
+        offsets = self.project.offsets
+        if offsets != None and 0 < len(offsets) < len(self.project.skelPics): # images appended (see InOut.append_pictures)
+            self.project.offsets = offsets + AI.frame_offsets(self.project.skelPics[len(offsets)-1:])[1:]
+        elif offsets == None or len(offsets) != len(self.project.skelPics):
+            self.project.offsets = AI.frame_offsets(self.project.skelPics)
+        
+    def run(self, engine="pixel", workers=1, checkpoint=0):
         """ 
         Runs an analysis on the list of skeleton images of the project.
+        The processing time is recorded in the :class:`Analysis` so that the engines can be compared.
         
+        :param str engine: the tracking engine to use, "pixel" or "graph" (see :data:`ENGINES`)
+        :param int workers: the number of processes exploring the branches of the hyphae (see :func:`AI.track_apex_parallel`)
+        :param int checkpoint: the number of images reached or nodes gone back to between two saves (see :meth:`run_events`), 0 not to save the project
         :return: a message indicating the state of the analysis
         :rtype: str
         
         .. codeauthor:: Laura Xénard
         """
         
-        message, isDone = AI.play_analysis(self.project.skelPics, self.project.analysis)        
-        if isDone:
-            self.colorize_final_img()
-        return (message, isDone)
+        for event, progress in self.run_events(engine, workers, checkpoint):
+            pass
+        return event.data
+    
+    def run_events(self, engine="pixel", workers=1, checkpoint=0):
+        """
+        Runs an analysis like :meth:`run`, step by step: each event of the analysis (see :func:`AI.analysis_events`) is sent 
+        with the progress of the analysis, the share of the images reached by the hyphae (between 0 and 1).
+        The last event is :data:`AI.END`, sent once the final image is colorized.
+        If 'checkpoint' is given (:data:`CHECKPOINT_STEPS` for instance), the project is saved incrementally every 'checkpoint' images reached 
+        or nodes gone back to, so that the analysis can be resumed (see :meth:`resume`) if it is interrupted.
+        
+        :param str engine: the tracking engine to use, "pixel" or "graph" (see :data:`ENGINES`)
+        :param int workers: the number of processes exploring the branches of the hyphae
+        :param int checkpoint: the number of images reached or nodes gone back to between two saves, 0 not to save the project
+        :return: the events of the analysis and the progress
+        :rtype: generator[(Event, float)]
+        """
+        
+        self.register()
+        analysis = self.project.analysis
+        events = AI.analysis_events(self.project.skelPics, analysis, ENGINES[engine], self.project.offsets, workers)
+        elapsed = analysis.processing_time if analysis.tracker != None else 0 # a resumed analysis goes on with its time
+        yield from self._follow(events, analysis.startImg, analysis.endImg, elapsed, checkpoint)
+    
+    def _follow(self, events, firstImg, lastImg, elapsed, checkpoint):
+        """
+        Passes on the events of an analysis with its progress from the image 'firstImg' to the image 'lastImg' (see :meth:`run_events`), 
+        saving the project at the checkpoints and recording the processing time, 'elapsed' seconds being already spent.
+        """
+        
+        analysis = self.project.analysis
+        nbImg = lastImg - firstImg + 1
+        furthest = firstImg
+        start = time.perf_counter() - elapsed
+        steps = 0
+        for event in events:
+            if event.kind == AI.FRAME:
+                furthest = max(furthest, event.image)
+            if event.kind in (AI.FRAME, AI.BACKTRACK) and checkpoint > 0 and analysis.tracker != None:
+                steps += 1
+                if steps % checkpoint == 0:
+                    analysis.processing_time = time.perf_counter() - start
+                    InOut.save_project(self.project, incremental=True) # if the save fails, the analysis goes on
+            if event.kind == AI.END:
+                analysis.processing_time = time.perf_counter() - start
+                if event.data[1]:
+                    self.colorize_final_img()
+                yield (event, 1.0)
+            else:
+                yield (event, (furthest - firstImg) / nbImg)
+    
+    def extend(self, endImg, engine="pixel"):
+        """
+        Extends the finished analysis of the project to the later images up to 'endImg': only the hyphae reaching its end image are followed,
+        into the new images (see :func:`AI.extension_events`).
+        
+        :param int endImg: the index of the new end image
+        :param str engine: the tracking engine to use, "pixel" or "graph" (see :data:`ENGINES`)
+        :return: a message indicating the state of the analysis
+        :rtype: str
+        """
+        
+        analysis = self.project.analysis
+        if analysis == None or analysis.hyphae == None or analysis.tracker != None:
+            return "No finished analysis to extend."
+        if not analysis.endImg < endImg < len(self.project.skelPics):
+            return "The new end image must come after the end image of the analysis."
+        for event, progress in self.extend_events(endImg, engine):
+            pass
+        return event.data
+    
+    def extend_events(self, endImg, engine="pixel", checkpoint=0):
+        """
+        Extends the finished analysis of the project like :meth:`extend`, step by step (see :meth:`run_events`), 
+        the progress being the share of the new images reached by the hyphae. The processing time of the extension is added to the one of the analysis.
+        
+        :param int endImg: the index of the new end image
+        :param str engine: the tracking engine to use, "pixel" or "graph" (see :data:`ENGINES`)
+        :param int checkpoint: the number of images reached or nodes gone back to between two saves, 0 not to save the project
+        :return: the events of the extension and the progress
+        :rtype: generator[(Event, float)]
+        """
+        
+        self.register()
+        analysis = self.project.analysis
+        firstImg = analysis.endImg + 1
+        events = AI.extension_events(self.project.skelPics, analysis, endImg, ENGINES[engine], self.project.offsets)
+        yield from self._follow(events, firstImg, endImg, analysis.processing_time, checkpoint)
                   
+    def resume(self, engine="pixel", workers=1, checkpoint=0):
+        """
+        Resumes the analysis of the project interrupted after one of its checkpoints (see :meth:`run_events`), 
+        the project being opened from its incremental save.
+        
+        :param str engine: the tracking engine to use, "pixel" or "graph" (see :data:`ENGINES`)
+        :param int workers: the number of processes exploring the branches of the hyphae met after the apex being followed
+        :param int checkpoint: the number of images reached or nodes gone back to between two saves, 0 not to save the project
+        :return: a message indicating the state of the analysis
+        :rtype: str
+        """
+        
+        project = getattr(self, 'project', None)
+        if project == None or project.analysis == None or project.analysis.tracker == None:
+            return "No interrupted analysis to resume."
+        return self.run(engine, workers, checkpoint)
+    
+    def watch_events(self, engine="pixel", interval=WATCH_INTERVAL, polls=None):
+        """
+        Watches the directories of the project for the images written during the experiment (see :func:`InOut.append_pictures`), every 'interval' seconds.
+        The new images are appended to the project, and its finished analysis is extended to the last one (see :meth:`extend_events`), 
+        its events being sent with their progress. The project is then saved incrementally, so that the results are published as the hyphae grow.
+        
+        :param str engine: the tracking engine to use, "pixel" or "graph" (see :data:`ENGINES`)
+        :param float interval: the number of seconds between two looks for new images
+        :param int polls: the number of looks for new images, None to watch until the generator is closed
+        :return: the events of the extensions of the analysis and their progress
+        :rtype: generator[(Event, float)]
+        :raise FileNotFoundError: if the skeleton or greyscale images directory has not been found
+        """
+        
+        poll = 0
+        while polls == None or poll < polls:
+            if poll > 0:
+                time.sleep(interval)
+            poll += 1
+            if InOut.append_pictures(self.project) == 0:
+                continue
+            analysis = self.project.analysis
+            if analysis != None and analysis.hyphae != None and analysis.tracker == None: # finished analysis
+                yield from self.extend_events(len(self.project.skelPics)-1, engine)
+                InOut.save_project(self.project, incremental=True)
+    
     def colorize_final_img(self, radius=5, color='red'):
         """
         Colorizes in red all the hyphae explored by the analysis. Works by drawing a red circle on every pixels covered during the analysis. 
@@ -249,7 +446,7 @@ class Mana:
         
         # Retrieving and copying of the analysis last image
         imgIndex = self.project.analysis.endImg # index of the last image of the analysis
-        self.project.analysis.finalImg = self.project.greyPics[imgIndex][0].copy() # copying the img so as to preserve the original img
+        self.project.analysis.finalImg = InOut.colour_image(self.project.greyPics[imgIndex][0]) # copying the img so as to preserve the original img
         
         # Drawing a red circle on every pixel
         draw = ImageDraw.Draw(self.project.analysis.finalImg)
@@ -312,7 +509,7 @@ class Mana:
                 apexCoord, imgIndex = self.project.analysis.steps[iStep]
                 if isinstance(apexCoord, msh.Coordinates):
                     img = self.project.greyPics[imgIndex-1][0]
-                    self.project.analysis.stepImg = img.copy() # copying the img so as to preserve the original img
+                    self.project.analysis.stepImg = InOut.colour_image(img) # copying the img so as to preserve the original img
                     
                     # Drawing a circle on the apex
                     draw = ImageDraw.Draw(self.project.analysis.stepImg)
@@ -325,6 +522,10 @@ class Mana:
             
         self.project.analysis.previousStepDisplayed = self.project.analysis.currentStep # update of the previously displayed step
         self.project.analysis.currentStep = iStep # update of the currently displayed step
+        steps = self.project.analysis.steps
+        direction = self._direction(iStep, self.project.analysis.previousStepDisplayed, len(steps)+1)
+        nextSteps = [(iStep + direction*i) % (len(steps)+1) for i in range(1, AI.PREFETCH_FRAMES+1)]
+        self._prefetch([steps[step][1]-1 for step in nextSteps if step in steps and steps[step][1] != None]) # the images of the next steps, without the steps not analyzed
         return 0 
     
     def colorImgNotDisplayed(self):
@@ -22,10 +22,13 @@
 # =============================================================================
 """
 :Synopsis: 
-    This module represents and manages the structure of the mycelium extracted from a data set throught these 5 classes:
+    This module represents and manages the structure of the mycelium extracted from a data set throught these 7 classes:
     
         * Coordinates
+        * PixelList
+        * IdAllocator
         * HyphaSegment
+        * TrackerState
         * Analysis
         * Project 
 
@@ -34,7 +37,7 @@
 """
 
 
-import itertools
+import collections.abc
 
 
 class Coordinates:
@@ -71,6 +74,30 @@ class Coordinates:
         return "({}, {})".format(int(self.x), int(self.y))
     
     
+    def __eq__(self, coord):
+        """
+        Overload of the equality for 2 :class:`Coordinates` objects: they are equal if they designate the same point.
+        
+        :return: True if both abscissae and both ordinates are equal, False otherwise
+        :rtype: bool
+        """
+        
+        if not isinstance(coord, Coordinates):
+            return NotImplemented # comparisons with strings or None are not equalities
+        return self.x == coord.x and self.y == coord.y
+    
+    
+    def __hash__(self):
+        """
+        Hash consistent with the equality, so that :class:`Coordinates` can be used in sets and as dictionary keys.
+        
+        :return: the hash of the couple (x, y)
+        :rtype: int
+        """
+        
+        return hash((self.x, self.y))
+    
+    
     def __add__(self, coord):
         """
         Overload of the addition for 2 :class:`Coordinates` objects.
@@ -86,6 +113,145 @@ class Coordinates:
         return Coordinates(xresult, yresult)
         
         
+class PixelList(collections.abc.MutableSequence):
+    """
+    Class representing an ordered list of pixel :class:`Coordinates` (duplicates allowed) whose membership test is done in constant time.
+    It behaves like a list: pixels can be appended, read and replaced by their index.
+    
+    :param pixels: the initial :class:`Coordinates` of the list
+    :type pixels: iterable[Coordinates]
+    :param int modified: the lowest index of the pixels replaced, removed or inserted since it was reset to None (see :class:`InOut.SaveJournal`)
+    """
+    
+    def __init__(self, pixels=()):
+        """
+        Class constructor.
+        """
+        
+        self._pixels = []
+        self._counts = {} # Coordinates : number of occurrences in the list
+        self.modified = None
+        self.extend(pixels)
+        
+    def _add(self, coord):
+        self._counts[coord] = self._counts.get(coord, 0) + 1
+        
+    def _remove(self, coord):
+        count = self._counts[coord] - 1
+        if count:
+            self._counts[coord] = count
+        else:
+            del self._counts[coord]
+            
+    def _modify(self, index):
+        if isinstance(index, slice):
+            start, stop, step = index.indices(len(self._pixels))
+            first = start if step > 0 else min(range(start, stop, step), default=start)
+        else:
+            first = index + len(self._pixels) if index < 0 else index
+        first = min(max(first, 0), len(self._pixels))
+        if self.modified == None or first < self.modified:
+            self.modified = first
+        
+    def __len__(self):
+        return len(self._pixels)
+    
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return PixelList(self._pixels[index])
+        return self._pixels[index]
+    
+    def __setitem__(self, index, coord):
+        self._modify(index)
+        if isinstance(index, slice):
+            for old in self._pixels[index]:
+                self._remove(old)
+            coord = list(coord)
+            for new in coord:
+                self._add(new)
+        else:
+            self._remove(self._pixels[index])
+            self._add(coord)
+        self._pixels[index] = coord
+    
+    def __delitem__(self, index):
+        self._modify(index)
+        removed = self._pixels[index] if isinstance(index, slice) else [self._pixels[index]]
+        for old in removed:
+            self._remove(old)
+        del self._pixels[index]
+        
+    def insert(self, index, coord):
+        self._modify(index)
+        self._pixels.insert(index, coord)
+        self._add(coord)
+        
+    def append(self, coord):
+        self._pixels.append(coord)
+        self._add(coord)
+        
+    def __contains__(self, coord):
+        return coord in self._counts
+    
+    def __iter__(self):
+        return iter(self._pixels)
+    
+    def __repr__(self):
+        return repr(self._pixels)
+    
+    def __getstate__(self):
+        return self._pixels # the counts are rebuilt when unpickling
+    
+    def __setstate__(self, pixels):
+        self._pixels = []
+        self._counts = {}
+        self.modified = None
+        self.extend(pixels)
+        
+        
+class IdAllocator:
+    """
+    Class allocating the ids of the objects of an :class:`Analysis` or a :class:`Project`, one by one or by compact ranges.
+    The ids only depend on the objects created by their owner, so that analyses run apart (in other threads or processes) can be merged.
+    
+    :param int nextId: the next id to allocate
+    """
+    
+    def __init__(self, start=1):
+        """
+        Class constructor.
+        
+        :param int start: the first id to allocate
+        """
+        
+        self.nextId = start
+        
+    def allocate(self):
+        """
+        Allocates a single id.
+        
+        :return: the id
+        :rtype: int
+        """
+        
+        allocated = self.nextId
+        self.nextId += 1
+        return allocated
+    
+    def reserve(self, count):
+        """
+        Allocates several consecutive ids at once.
+        
+        :param int count: the number of ids
+        :return: the ids
+        :rtype: range
+        """
+        
+        allocated = range(self.nextId, self.nextId + count)
+        self.nextId += count
+        return allocated
+
+
 class HyphaSegment:
     """
     Class representing a hypha segment which is the section of the hypha comprised between two nodes or between a node and an apex.
@@ -103,10 +269,8 @@ class HyphaSegment:
     .. codeauthor:: Laura Xénard
     """
     
-    segmentCount = itertools.count(1) # we start at 1
-    
-    def __init__(self, previousID, start):
-        self.id = next(HyphaSegment.segmentCount)
+    def __init__(self, id, previousID, start):
+        self.id = id
         self.previous = previousID
         self.deadEnd = False
         self.coord = [start]
@@ -114,12 +278,48 @@ class HyphaSegment:
         self.size = 1
 
 
+class TrackerState:
+    """
+    Class representing where the tracking of an apex stands, so that an interrupted analysis can be resumed from its last image or node (see :func:`AI.analysis_events`).
+    
+    :param int origin: the index in the origins of the :class:`Analysis` of the apex being followed
+    :param known: the ids of the segments found before following this apex
+    :type known: list[int]
+    :param HyphaSegment segment: the segment being followed, None until the tracking has started
+    :param int num_picture: the index of the image where the tracking goes on
+    :param Coordinates coord: the :class:`Coordinates` of the pixel where the tracking goes on
+    :param Coordinates previous: the :class:`Coordinates` of the end of the hypha on the previous image
+    :param bool check: True if the pixels not belonging to the hypha have to be searched on the image first (new image), False otherwise
+    :param nodes: the nodes whose other hypha is still to follow: [image index, :class:`Coordinates` of the start of the hypha, id of the previous segment]
+    :type nodes: list[list]
+    :param frontier: for the extension of an analysis to later images, the segments still to follow into them: [segment id, index of the first new image], None otherwise
+    :type frontier: list[list]
+    """
+    
+    def __init__(self, origin, known):
+        """
+        Class constructor.
+        """
+        
+        self.origin = origin
+        self.known = sorted(known)
+        self.segment = None
+        self.num_picture = None
+        self.coord = None
+        self.previous = None
+        self.check = False
+        self.nodes = []
+        self.frontier = None
+
+
 class Analysis:
     """
     Class representing an analysis run on an image dataset in fonction of the user's parameters.
         
     :param int id: the id of the analysis
     :param Coordinates startApex: the :class:`Coordinates` of the apex chosen as the starting point of the analysis
+    :param origins: the :class:`Coordinates` of all the apexes of the start image followed by the analysis, startApex being the first one
+    :type origins: list[Coordinates]
     :param int startImg: the index of the start image of the analysis
     :param int endImg: the index of the end image of the analysis
     :param steps: a dictionary of the analysis steps, linking the step index with the :class:`Coordinates` of the followed apex and the index of the corresponding image
@@ -132,17 +332,19 @@ class Analysis:
     :type segments: list[HyphaSegment]
     :param hyphae: a hyphae dictionary linkink each hypha with the id of its segments
     :type hyphae: dict{int : list[int]}
+    :param forests: a dictionary linking the index of each followed apex in origins with the id of the segments found from it
+    :type forests: dict{int : list[int]}
     :param list_pixels: a list of :class:`Coordinates` of the hyphae pixels
-    :type list_pixels: list[Coordinates]
+    :type list_pixels: PixelList
     :param int processingTime: the processing time of the analysis
+    :param IdAllocator segmentIds: the allocator of the ids of the segments (see :meth:`new_segment`)
+    :param TrackerState tracker: where the tracking stands while the analysis runs, None before and after
     
     .. codeauthor:: Sébastien Maillos
     .. codeauthor:: Laura Xénard
     """
     
-    analysisCount = itertools.count(1) # we start at 1
-    
-    def __init__(self, startApex, startImg):
+    def __init__(self, startApex, startImg, id=1):
         """
         Class constructor.
         
@@ -150,8 +352,9 @@ class Analysis:
         .. codeauthor:: Laura Xénard
         """
         
-        self.id = next(Analysis.analysisCount)
+        self.id = id
         self.startApex = startApex
+        self.origins = [startApex]
         self.startImg = startImg
         self.endImg = None
         self.steps = {}
@@ -161,8 +364,33 @@ class Analysis:
         self.previousStepDisplayed = 0
         self.segments = {}
         self.hyphae = None
-        self.list_pixels = []
+        self.forests = {}
+        self.list_pixels = PixelList()
         self.processing_time = 0 
+        self.segmentIds = IdAllocator(1) # we start at 1
+        self.tracker = None
+        
+        
+    def new_segment(self, previousID, start):
+        """
+        Creates a :class:`HyphaSegment` of the analysis with the next segment id.
+        
+        :param int previousID: the id of the previous segment, 0 if there is none
+        :param Coordinates start: the :class:`Coordinates` of the start of the segment
+        :return: the new segment
+        :rtype: HyphaSegment
+        """
+        
+        return HyphaSegment(self.segmentIds.allocate(), previousID, start)
+    
+    def __getattr__(self, name):
+        # Only called for the missing attributes: the heavy sections of an analysis read from a save are loaded when first used (see InOut.read_project).
+        sections = self.__dict__.get('_sections')
+        if sections == None or name not in sections.names:
+            raise AttributeError(name)
+        value = sections.load(self, name)
+        setattr(self, name, value)
+        return value
 
 
 class Project:
@@ -172,21 +400,24 @@ class Project:
     :param int id: the id of the project
     :param str path: the path to the project environment (directory)
     :param skelPics: a sorted list of tuples (img, img name) of skeleton images to analyze
-    :type skelPics: list[(Image, str)]
+    :type skelPics: list[(Image, str)] or InOut.ImageStore
     :param greyPics: a sorted list of tuples (img, img name) of greyscale images to display in the UI
-    :type greyPics: list[(Image, str)]
+    :type greyPics: list[(Image, str)] or InOut.ImageStore
     :param int currentImg: the index of the image currently being displayed
     :param int previousImgDisplayed: the index of the image previously being displayed
     :param str notes: notes on the analysis (the notes will be exported)
     :param Analysis analysis: the :class:`Analysis` object holding the analysis data    
+    :param offsets: the drift of each skeleton image compared to the previous one, computed once for the project (None until then)
+    :type offsets: list[Coordinates]
+    :param IdAllocator analysisIds: the allocator of the ids of the analyses of the project
+    :param journal: what has been written of the project by its last incremental save, None until then
+    :type journal: InOut.SaveJournal
     
     .. codeauthor:: Sébastien Maillos
     .. codeauthor:: Laura Xénard
     """
     
-    projectCount = itertools.count() # we start at 1
-    
-    def __init__(self, path):
+    def __init__(self, path, id=0):
         """
         Class constructor.
         
@@ -194,7 +425,7 @@ class Project:
         .. codeauthor:: Laura Xénard
         """
         
-        self.id = next(Project.projectCount) 
+        self.id = id
         self.path = path
         self.skelPics = [] # list (Image, skelName)
         self.greyPics = [] # list (Image, greyName)
@@ -202,6 +433,9 @@ class Project:
         self.previousImgDisplayed = 0 
         self.notes = ""
         self.analysis = None # we wait for startImg, endImg and startApex
+        self.offsets = None # computed before the first analysis
+        self.analysisIds = IdAllocator(1) # we start at 1
+        self.journal = None # no incremental save yet
 
         
     def clear(self):
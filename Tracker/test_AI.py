@@ -0,0 +1,105 @@
+# -*- coding: utf-8 -*-
+"""
+Module of tests for the module AI.
+
+"""
+
+import unittest
+
+from PIL import Image, ImageDraw
+
+import Mushroom as msh
+import AI
+
+
+class AITest(unittest.TestCase):
+
+    def setUp(self):
+        """
+        Initialization: a hypha growing upward, with a branch appearing on the 5th image whose end moves slightly from one image to the next.
+        """
+
+        self.pictures = []
+        for t, shift in enumerate([0, 0, 0, 0, 0, 2, -2, 3]):
+            img = Image.new('L', (600, 600), 0)
+            draw = ImageDraw.Draw(img)
+            draw.line([(300, 560), (300, 500-25*t)], fill=255)
+            if t >= 4:
+                draw.line([(299, 424), (299-15*(t-3), 424-15*(t-3)+shift)], fill=255)
+            self.pictures.append((img, "img{}.png".format(t)))
+
+    def analysis(self, endImg):
+        """
+        Returns the analysis of the apex at the top of the hypha on the first image, up to the given end image.
+        """
+
+        isApex, apex = AI.is_apex(self.pictures[0], msh.Coordinates(300, 502))
+        analysis = msh.Analysis(apex, 0)
+        analysis.endImg = endImg
+        AI.play_analysis(self.pictures, analysis)
+        return analysis
+
+    def test_extension_events(self):
+        """
+        Tests that an analysis extended to later images finds the same hyphae as an analysis run directly up to the last one.
+        """
+
+        def segments(analysis):
+            return sorted((repr(segment.coord), segment.deadEnd, segment.size, repr(sorted(segment.evolution.items())))
+                          for segment in analysis.segments.values())
+
+        extended = self.analysis(4)
+        events = list(AI.extension_events(self.pictures, extended, 6))
+        self.assertEqual(events[-1].data, ("Analysis ended.", True))
+        direct = self.analysis(6)
+        self.assertEqual(segments(extended), segments(direct))
+        self.assertEqual(sorted(map(repr, extended.list_pixels)), sorted(map(repr, direct.list_pixels)))
+
+    def test_pack_skeleton(self):
+        """
+        Tests that a skeleton image is packed with its white pixels only, without being kept in the cache of the frames.
+        """
+
+        img = Image.new('1', (20, 10), 0)
+        img.putpixel((13, 4), 1)
+        frame = AI.pack_skeleton(img)
+        self.assertEqual((frame.shape, frame.nbytes), ((10, 20), 30))
+        self.assertEqual(AI.check_point((frame, None), msh.Coordinates(12, 4), 5), [msh.Coordinates(13, 4)])
+        self.assertFalse(any(cached[0] is img for cached in AI._frameCache.values()))
+
+    def test_all_apexes_short_fragment(self):
+        """
+        Tests that the fragments too short to be hyphae are skipped when all the apexes of the start image are followed.
+        """
+
+        for img, name in self.pictures:
+            ImageDraw.Draw(img).line([(400, 100), (403, 100)], fill=255) # noise
+        apexes = AI.find_endpoints(self.pictures[0])
+        self.assertIn(msh.Coordinates(400, 100), apexes)
+        analysis = msh.Analysis(apexes[0], 0)
+        analysis.origins = apexes
+        analysis.endImg = 3
+        self.assertEqual(AI.play_analysis(self.pictures, analysis), ("Analysis ended.", True))
+        self.assertNotIn(msh.Coordinates(400, 100), analysis.list_pixels)
+        self.assertIn(msh.Coordinates(300, 425), analysis.list_pixels)
+
+    def test_track_apex_parallel(self):
+        """
+        Tests that the branches explored by several processes give the same analysis as the ones explored one after the other.
+        """
+
+        for t, (img, name) in enumerate(self.pictures):
+            draw = ImageDraw.Draw(img)
+            if t >= 6:
+                draw.line([(301, 349), (301+12*(t-5), 349-6*(t-5))], fill=255) # another branch
+            draw.line([(360, 560), (420, 400)], fill=255) # another hypha
+
+        def analysis(workers):
+            isApex, apex = AI.is_apex(self.pictures[0], msh.Coordinates(300, 502))
+            analysis = msh.Analysis(apex, 0)
+            analysis.endImg = 7
+            self.assertEqual(AI.play_analysis(self.pictures, analysis, workers=workers), ("Analysis ended.", True))
+            segments = {id: (segment.previous, repr(segment.coord), repr(segment.evolution)) for id, segment in analysis.segments.items()}
+            return (analysis.hyphae, segments, repr(analysis.steps), repr(analysis.list_pixels))
+
+        self.assertEqual(analysis(2), analysis(1))
@@ -0,0 +1,73 @@
+# -*- coding: utf-8 -*-
+"""
+Module of tests for the module Batch.
+
+"""
+
+import os
+import sys
+import subprocess
+import tempfile
+import unittest
+
+import numpy as np
+from PIL import Image
+
+import Batch
+
+
+class BatchTest(unittest.TestCase):
+
+    def setUp(self):
+        """
+        Initialization: a project of 3 images of a hypha growing upward, saved as PNG files.
+        """
+
+        self.directory = tempfile.TemporaryDirectory()
+        self.path = self.directory.name
+        for directory in ('skeletons', 'regMosaic'):
+            os.mkdir(os.path.join(self.path, directory))
+        for i in range(3):
+            array = np.zeros((80, 80), dtype=np.uint8)
+            array[40-5*i:70, 40] = 255
+            for directory in ('skeletons', 'regMosaic'):
+                Image.fromarray(array).save(os.path.join(self.path, directory, "img{}.png".format(i)))
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def test_parse_arguments(self):
+        """
+        Tests that an analysis needs an apex or a save to resume, and that only the known data can be exported.
+        """
+
+        arguments = Batch.parse_arguments([self.path, '--apex', '10', '20', '--export', 'text,image'])
+        self.assertEqual((arguments.apex, arguments.start, arguments.end, arguments.export), ([10, 20], 1, None, ['text', 'image']))
+        for argv in ([self.path], [self.path, '--apex', '10', '20', '--resume'], [self.path, '--resume', '--export', 'notes']):
+            with self.assertRaises(SystemExit):
+                Batch.parse_arguments(argv)
+
+    def test_main(self):
+        """
+        Tests that an analysis is run and saved from the command line without loading PyQt,
+        nor tifffile for images which are not TIFF files.
+        """
+
+        command = ("import sys, Batch; status = Batch.main(sys.argv[1:]); "
+                   "sys.exit(status or any(module.startswith(('PyQt5', 'tifffile')) for module in sys.modules))")
+        process = subprocess.run([sys.executable, '-c', command, self.path, '--apex', '40', '40', '--end', '3'],
+                                 cwd=os.path.dirname(os.path.abspath(__file__)), stdout=subprocess.PIPE, universal_newlines=True)
+        self.assertEqual(process.returncode, 0, process.stdout)
+        self.assertIn("Analysis ended.", process.stdout)
+        self.assertTrue(os.path.exists(os.path.join(self.path, 'save', 'Project')))
+
+        self.assertEqual(Batch.main([self.path, '--apex', '0', '0']), 1) # no apex there
+        self.assertEqual(Batch.main([self.path, '--resume']), 1) # the analysis is over
+
+    def test_main_modules(self):
+        """
+        Tests that PyQt is still not loaded once an analysis has been run in the same process.
+        """
+
+        self.assertEqual(Batch.main([self.path, '--apex', '40', '40', '--end', '3']), 0)
+        self.assertNotIn('PyQt5', sys.modules)
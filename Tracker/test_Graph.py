@@ -0,0 +1,47 @@
+# -*- coding: utf-8 -*-
+"""
+Module of tests for the module Graph.
+
+"""
+
+import unittest
+
+import numpy as np
+from PIL import Image
+
+import Mushroom as msh
+import Graph
+
+
+class GraphTest(unittest.TestCase):
+
+    def setUp(self):
+        """
+        Initialization: a skeleton shaped like a T (3 ends and 1 node).
+        """
+
+        array = np.zeros((9, 9), dtype=np.uint8)
+        array[4, 1:8] = 255
+        array[1:4, 4] = 255
+        self.picture = (Image.fromarray(array), "t.tif")
+
+    def test_skeleton_graph(self):
+        """
+        Tests that the ends and the node become vertices linked by 3 edges.
+        """
+
+        graph = Graph.skeleton_graph(self.picture)
+        self.assertEqual(len(graph.vertices), 4)
+        self.assertEqual(len(graph.edges), 3)
+        self.assertEqual(sorted(edge.length for edge in graph.edges), [2, 2, 2])
+
+    def test_graph_analyze(self):
+        """
+        Tests that following the hypha from an end finds the node.
+        """
+
+        pixels = msh.PixelList([msh.Coordinates(1, 4)])
+        result = Graph.graph_analyze(self.picture, pixels, msh.PixelList(), msh.Coordinates(1, 4))
+        self.assertEqual(result[0], "Node")
+        self.assertEqual(result[1], msh.Coordinates(3, 4))
+        self.assertEqual({result[2], result[3]}, {msh.Coordinates(4, 3), msh.Coordinates(4, 4)})
@@ -10,10 +10,18 @@ Module of tests  for the module InOut.
 """
 
 import os
+import pickle
 import shutil
+import tempfile
 import unittest
+
+import numpy as np
+import tifffile
+from PIL import Image
+
 import Mushroom as msh
 import InOut
+import AI
 
 
 class InOutTest(unittest.TestCase):    
@@ -178,4 +186,274 @@ class InOutTest(unittest.TestCase):
         self.assertEqual(InOut.export_project(project2, True, False, False), "An error occurred during the export.")
         
         # Cleaning after the test
-        os.mkdir(path)
\ No newline at end of file
+        os.mkdir(path)
+        
+    def test_image_store(self):
+        """
+        Tests that an ImageStore decodes its images on access and keeps them within its budget.
+        """
+        
+        with tempfile.TemporaryDirectory() as path:
+            paths = []
+            for i in range(3):
+                paths.append(os.path.join(path, "img{}.png".format(i)))
+                Image.new('L', (10, 10), i).save(paths[-1])
+            store = InOut.ImageStore(paths, 'RGBA', budget=800) # room for 2 images of 400 bytes
+            self.assertEqual(len(store), 3)
+            img, name = store[1]
+            self.assertEqual((img.mode, img.getpixel((0, 0))[0], name), ('RGBA', 1, "img1.png"))
+            self.assertIs(store[1][0], img)
+            store[0], store[2]
+            self.assertIsNot(store[1][0], img) # forgotten then decoded again
+            self.assertEqual([name for img, name in store[-2:]], ["img1.png", "img2.png"])
+            
+            store = InOut.ImageStore(paths, 'RGBA', budget=800)
+            self.assertEqual(store.load(workers=2), 2) # the first images are decoded until the budget is full
+            self.assertEqual(store[0][0].getpixel((0, 0))[0], 0)
+            
+            store = InOut.ImageStore(paths)
+            store.prefetch([2, 1, 7])
+            self.assertEqual(store[2][0].getpixel((0, 0)), 2) # decoded in the background
+            store[1]
+            self.assertEqual(sorted(store._images), [1, 2])
+        
+    def test_manifest(self):
+        """
+        Tests that the manifest of the images detects the modified, added and removed images only.
+        """
+        
+        with tempfile.TemporaryDirectory() as path:
+            for directory in ('skeletons', 'regMosaic', 'save'):
+                os.mkdir(os.path.join(path, directory))
+            for i in range(2):
+                Image.new('L', (10, 10), 0).save(os.path.join(path, 'skeletons', "s{}.png".format(i)))
+                Image.new('L', (10, 10), 0).save(os.path.join(path, 'regMosaic', "g{}.png".format(i)))
+            project = msh.Project(path)
+            InOut.load_pictures(project, workers=0)
+            InOut.write_manifest(project)
+            manifest = InOut.read_manifest(project)
+            self.assertEqual(manifest['skeletons/s0.png']['width'], 10)
+            self.assertEqual(InOut.changed_images(project, manifest), [])
+            
+            os.utime(os.path.join(path, 'skeletons', "s0.png"), ns=(0, 0)) # same content
+            Image.new('L', (10, 10), 255).save(os.path.join(path, 'regMosaic', "g1.png"))
+            os.remove(os.path.join(path, 'skeletons', "s1.png"))
+            Image.new('L', (10, 10), 0).save(os.path.join(path, 'skeletons', "s2.png"))
+            InOut.load_pictures(project, workers=0)
+            self.assertEqual(InOut.changed_images(project, manifest), ['regMosaic/g1.png', 'skeletons/s1.png', 'skeletons/s2.png'])
+        
+    def test_append_pictures(self):
+        """
+        Tests that only the images written in both directories since the loading are appended.
+        """
+        
+        with tempfile.TemporaryDirectory() as path:
+            for directory in ('skeletons', 'regMosaic'):
+                os.mkdir(os.path.join(path, directory))
+            for name in ("a.png", "b.png"):
+                Image.new('L', (10, 10), 0).save(os.path.join(path, 'skeletons', name))
+                Image.new('L', (10, 10), 0).save(os.path.join(path, 'regMosaic', name))
+            project = msh.Project(path)
+            InOut.load_pictures(project, workers=0)
+            self.assertEqual(InOut.append_pictures(project), 0)
+            
+            for name in ("c.png", "d.png"):
+                Image.new('L', (10, 10), 255).save(os.path.join(path, 'skeletons', name))
+            Image.new('L', (10, 10), 255).save(os.path.join(path, 'regMosaic', "c.png"))
+            self.assertEqual(InOut.append_pictures(project), 0) # still being written
+            self.assertEqual(InOut.append_pictures(project, settle=0), 1) # "d.png" is not in 'regMosaic' yet
+            self.assertEqual([name for img, name in project.skelPics], ["a.png", "b.png", "c.png"])
+            self.assertEqual(project.greyPics[2][0].getpixel((0, 0)), 255)
+        
+    def test_append_pictures_save(self):
+        """
+        Tests that the images appended to a project are described by the manifest of its incremental save, so that it is opened without changed images.
+        """
+        
+        with tempfile.TemporaryDirectory() as path:
+            for directory in ('skeletons', 'regMosaic', 'save'):
+                os.mkdir(os.path.join(path, directory))
+            for name in ("a.png", "b.png"):
+                Image.new('L', (10, 10), 0).save(os.path.join(path, 'skeletons', name))
+                Image.new('L', (10, 10), 0).save(os.path.join(path, 'regMosaic', name))
+            project = msh.Project(path)
+            InOut.load_pictures(project, workers=0)
+            project.offsets = [msh.Coordinates(0, 0)] * 2
+            self.assertEqual(InOut.save_project(project, incremental=True), "Project saved.")
+            
+            for directory in ('skeletons', 'regMosaic'):
+                Image.new('L', (10, 10), 0).save(os.path.join(path, directory, "c.png"))
+            self.assertEqual(InOut.append_pictures(project, settle=0), 1)
+            project.offsets = project.offsets + [msh.Coordinates(1, 0)]
+            InOut.save_project(project, incremental=True)
+            self.assertEqual(project.journal.records, 1)
+            
+            opened, loadingOK, message = InOut.open_project(os.path.join(path, 'save', InOut.SAVE_NAME))
+            self.assertEqual((loadingOK, message), (True, "Project loaded."))
+            self.assertEqual(opened.offsets, project.offsets)
+        
+    def test_tiff_stack(self):
+        """
+        Tests that a directory holding a multipage TIFF file is read as a stack of images.
+        """
+        
+        with tempfile.TemporaryDirectory() as path:
+            for directory in ('skeletons', 'regMosaic'):
+                os.mkdir(os.path.join(path, directory))
+            frames = np.zeros((3, 10, 10), dtype=np.uint8)
+            frames[:, 5, 2:8] = 255
+            tifffile.imwrite(os.path.join(path, 'skeletons', "skel.tif"), frames, photometric='minisblack') # memory-mapped
+            tifffile.imwrite(os.path.join(path, 'regMosaic', "grey.tif"), frames, photometric='minisblack', compression='zlib') # read page by page
+            project = msh.Project(path)
+            self.assertEqual(InOut.load_pictures(project), (True, "Images successfully loaded."))
+            self.assertEqual([name for img, name in project.skelPics], ["skel.tif #1", "skel.tif #2", "skel.tif #3"])
+            self.assertEqual(project.skelPics[1][0][5:6, 0:10].tolist(), [[0, 0, 255, 255, 255, 255, 255, 255, 0, 0]])
+            self.assertEqual(project.greyPics[2][0].getpixel((2, 5)), 255)
+        
+    def test_tiled_frame(self):
+        """
+        Tests that the areas of a tiled TIFF image are read like those of the whole image.
+        """
+        
+        array = np.zeros((100, 70), dtype=np.uint8)
+        array[10:90, 33] = 255
+        array[50, 5:65] = 255
+        with tempfile.TemporaryDirectory() as path:
+            file = os.path.join(path, "skel.tif")
+            tifffile.imwrite(file, array, tile=(32, 32), compression='zlib')
+            frame = InOut.TiledFrame(file)
+            self.assertEqual(frame.shape, (100, 70))
+            self.assertTrue((frame[40:60, 20:50] == array[40:60, 20:50]).all())
+            self.assertTrue((frame[-5:200, 60:70] == array[-5:200, 60:70]).all())
+            self.assertTrue((frame.unpack() == array).all())
+            self.assertEqual(len(frame._tiles), 12)
+            
+            bandRows, AI.BAND_ROWS = AI.BAND_ROWS, 32 # the whole image is read by bands of one row of tiles
+            try:
+                frame = InOut.TiledFrame(file)
+                self.assertTrue((AI.pack_skeleton(frame).unpack() == array).all())
+                self.assertEqual(AI.find_endpoints((frame, "skel.tif")), AI.find_endpoints((array.copy(), None)))
+                self.assertFalse(any(cached[0] is frame and cached[1] is not None for cached in AI._frameCache.values()))
+            finally:
+                AI.BAND_ROWS = bandRows
+        
+    def test_file_pool(self):
+        """
+        Tests that the pool keeps at most its number of files open, opening again the closed ones when they are read.
+        """
+        
+        pool = InOut.FilePool(2)
+        with tempfile.TemporaryDirectory() as path:
+            files = [os.path.join(path, "skel{}.tif".format(i)) for i in range(3)]
+            for i, file in enumerate(files):
+                tifffile.imwrite(file, np.full((4, 4), i, dtype=np.uint8))
+            for file in files + files[:1]:
+                pool.read(file, lambda tif: tif.pages[0].asarray())
+            self.assertEqual(len(pool), 2)
+            self.assertEqual(pool.read(files[0], lambda tif: tif.pages[0].asarray())[0, 0], 0)
+            pool.close()
+            self.assertEqual(len(pool), 0)
+        
+    def test_write_project(self):
+        """
+        Tests that a saved project is read identically, its heavy sections being read when first used, and that a pickled project can still be opened.
+        """
+        
+        project = msh.Project("/data/project", 2)
+        analysis = msh.Analysis(msh.Coordinates(4, 1), 0, 3)
+        segment = analysis.new_segment(0, msh.Coordinates(4, 1))
+        segment.coord.append(msh.Coordinates(4, 6))
+        segment.evolution = {1: [msh.Coordinates(4, 3), 2], 2: [msh.Coordinates(4, 6), 3]}
+        segment.deadEnd = True
+        analysis.segments[segment.id] = segment
+        analysis.list_pixels.extend(msh.Coordinates(4, y) for y in range(1, 7))
+        analysis.steps = {1: [msh.Coordinates(4, 3), 1], 2: [None, None]}
+        analysis.finalImg = Image.new('RGBA', (8, 8), (255, 0, 0, 255))
+        analysis.tracker = msh.TrackerState(0, [])
+        analysis.tracker.segment, analysis.tracker.num_picture, analysis.tracker.coord = segment, 3, msh.Coordinates(4, 6)
+        analysis.tracker.nodes = [[2, msh.Coordinates(5, 4), 1]]
+        project.analysis = analysis
+        with tempfile.TemporaryDirectory() as path:
+            InOut.write_project(project, os.path.join(path, "save"))
+            read = InOut.read_project(os.path.join(path, "save"))
+            self.assertEqual((read.id, read.path, read.analysis.id, read.analysis.startApex), (2, "/data/project", 3, msh.Coordinates(4, 1)))
+            self.assertNotIn('list_pixels', vars(read.analysis))
+            self.assertEqual(list(read.analysis.list_pixels), list(analysis.list_pixels))
+            self.assertEqual(read.analysis.steps, analysis.steps)
+            self.assertEqual(read.analysis.segments[1].evolution, segment.evolution)
+            self.assertEqual(read.analysis.segments[1].coord, segment.coord)
+            self.assertEqual(read.analysis.finalImg.getpixel((0, 0)), (255, 0, 0, 255))
+            self.assertIsNone(read.analysis.stepImg)
+            self.assertEqual((read.analysis.tracker.num_picture, read.analysis.tracker.nodes), (3, [[2, msh.Coordinates(5, 4), 1]]))
+            self.assertEqual(read.analysis.tracker.segment.evolution, segment.evolution)
+            self.assertEqual(read.analysis.new_segment(1, msh.Coordinates(0, 0)).id, 2)
+            
+            project.path = path
+            with open(os.path.join(path, "pickled"), 'wb') as file:
+                pickle.dump(project, file)
+            opened, loadingOK, message = InOut.open_project(os.path.join(path, "pickled"))
+            self.assertEqual(opened.analysis.segments[1].coord, segment.coord)
+        
+    def test_write_project_no_analysis(self):
+        """
+        Tests that the segments ended by "No analysis" are saved, their letters of the string being read as missing values.
+        """
+        
+        project = msh.Project("/data/project", 2)
+        analysis = msh.Analysis(msh.Coordinates(4, 1), 0, 3)
+        segment = analysis.new_segment(0, msh.Coordinates(4, 1))
+        segment.coord.append("o") # the tracking keeps "No analysis"[1] as the end of an artefact, and "No analysis"[4] as its length
+        segment.evolution = {1: [msh.Coordinates(4, 3), 2], 2: ["o", "n"]}
+        segment.deadEnd = True
+        segment.size = AI.calculated_size(segment)
+        analysis.segments[segment.id] = segment
+        project.analysis = analysis
+        with tempfile.TemporaryDirectory() as path:
+            InOut.write_project(project, os.path.join(path, "save"))
+            read = InOut.read_project(os.path.join(path, "save")).analysis.segments[1]
+            self.assertEqual(read.coord, [msh.Coordinates(4, 1), None])
+            self.assertEqual(read.evolution, {1: [msh.Coordinates(4, 3), 2], 2: [None, None]})
+            self.assertEqual(AI.calculated_size(read), read.size)
+        
+    def test_save_journal(self):
+        """
+        Tests that the incremental saves only append the changes to the journal, which is replayed when the save is read.
+        """
+        
+        project = msh.Project("/data/project")
+        project.analysis = msh.Analysis(msh.Coordinates(4, 1), 0)
+        segment = project.analysis.new_segment(0, msh.Coordinates(4, 1))
+        project.analysis.segments[segment.id] = segment
+        project.analysis.list_pixels.append(msh.Coordinates(4, 1))
+        with tempfile.TemporaryDirectory() as path:
+            save = os.path.join(path, "Project")
+            InOut.save_journal(project, save)
+            self.assertFalse(os.path.exists(save + InOut.JOURNAL_EXTENSION))
+            
+            segment.coord.append(msh.Coordinates(4, 3))
+            segment.evolution[1] = [msh.Coordinates(4, 3), 2]
+            project.analysis.list_pixels.extend([msh.Coordinates(4, 2), msh.Coordinates(4, 3)])
+            InOut.save_journal(project, save)
+            second = project.analysis.new_segment(1, msh.Coordinates(5, 4))
+            project.analysis.segments[second.id] = second
+            InOut.save_journal(project, save)
+            self.assertEqual(project.journal.records, 2)
+            
+            read = InOut.read_project(save)
+            self.assertEqual(InOut.replay_journal(read, save), 2)
+            self.assertEqual(list(read.analysis.list_pixels), list(project.analysis.list_pixels))
+            self.assertEqual(read.analysis.segments[1].coord, segment.coord)
+            self.assertEqual(read.analysis.segments[2].previous, 1)
+            
+            pixels = project.analysis.list_pixels
+            pixels.extend(msh.Coordinates(4, y) for y in range(4, 8))
+            InOut.save_journal(project, save)
+            pixels[-3] = msh.Coordinates(5, 5) # end of the hypha moved on a new image (see AI.shift_correction)
+            InOut.save_journal(project, save)
+            read = InOut.read_project(save)
+            InOut.replay_journal(read, save)
+            self.assertEqual(list(read.analysis.list_pixels), list(pixels))
+            
+            project.analysis = msh.Analysis(msh.Coordinates(0, 0), 0, 2) # another analysis: the journal is compacted
+            InOut.save_journal(project, save)
+            self.assertFalse(os.path.exists(save + InOut.JOURNAL_EXTENSION))
@@ -29,6 +29,39 @@ class MushroomTest(unittest.TestCase):
         self.assertEqual(self.coord1.y + self.coord2.y, self.coord3.y)
         self.assertIsInstance(self.coord3, msh.Coordinates)
         
+    def test_eq_coord(self):
+        """
+        Teste l'égalité de deux Coordinates désignant le même point.
+        """
         
-
-        
\ No newline at end of file
+        self.assertEqual(msh.Coordinates(3, 5), msh.Coordinates(3, 5))
+        self.assertNotEqual(msh.Coordinates(3, 5), msh.Coordinates(5, 3))
+        self.assertNotEqual(msh.Coordinates(3, 5), "n")
+        self.assertEqual(len({msh.Coordinates(3, 5), msh.Coordinates(3.0, 5.0)}), 1)
+        
+    def test_pixel_list(self):
+        """
+        Teste l'appartenance à une PixelList après ajout et remplacement de pixels.
+        """
+        
+        pixels = msh.PixelList([msh.Coordinates(0, 0), msh.Coordinates(1, 1)])
+        pixels.append(msh.Coordinates(1, 1))
+        pixels[1] = msh.Coordinates(2, 2)
+        self.assertIn(msh.Coordinates(1, 1), pixels) # still present at index 2
+        self.assertIn(msh.Coordinates(2, 2), pixels)
+        pixels[-1] = msh.Coordinates(3, 3)
+        self.assertNotIn(msh.Coordinates(1, 1), pixels)
+        self.assertEqual(len(pixels), 3)
+        self.assertEqual(pixels[-1], msh.Coordinates(3, 3))
+        
+    def test_id_allocator(self):
+        """
+        Teste que les identifiants des segments sont propres à chaque analyse et réservés par plages contiguës.
+        """
+        
+        analysis1 = msh.Analysis(msh.Coordinates(0, 0), 0)
+        analysis2 = msh.Analysis(msh.Coordinates(0, 0), 0)
+        self.assertEqual(analysis1.new_segment(0, msh.Coordinates(0, 0)).id, 1)
+        self.assertEqual(analysis2.new_segment(0, msh.Coordinates(0, 0)).id, 1)
+        self.assertEqual(list(analysis1.segmentIds.reserve(3)), [2, 3, 4])
+        self.assertEqual(analysis1.new_segment(1, msh.Coordinates(0, 0)).id, 5)